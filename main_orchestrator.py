@@ -5,10 +5,14 @@ import os
 import random
 import json
 from src.scenario_content_gen import generate_phishing_email, generate_malicious_website_html
-from src.environment_manager import simulate_env_adjustment
-from src.attack_agent import get_attack_decision, simulate_attack_step
-from src.defense_agent import analyze_log_entry, execute_automated_response, SUSPICIOUS_KEYWORDS
-from src.evaluation_agent import log_event, generate_evaluation_report, LOG_FILE_PATH
+from src.action_queue import EnvironmentActionQueue
+from src.attack_agent import get_attack_decision, simulate_attack_step, llm_session
+from src.defense_agent import analyze_log_entry, select_response, execute_automated_response, get_template_cache_stats, SUSPICIOUS_KEYWORDS
+from src.evaluation_agent import log_event, generate_evaluation_report, attach_event_repository, LOG_FILE_PATH
+from src.event_repository import EventRepository
+from src.container_state import container_state_cache
+from src.adaptation_precompute import adaptation_precomputer
+from src.events import ScenarioGenerated, AttackDecision, AttackSimulated, RawLogEntry, AnomalyDetected, DefenseExecuted
 
 # Ensure logs directory exists for evaluation_agent
 os.makedirs(os.path.dirname(LOG_FILE_PATH), exist_ok=True)
@@ -20,22 +24,41 @@ def run_cyber_range_exercise(duration_seconds=10):
 
     # --- 1. Dynamic Scenario Generation (Initial Setup) ---
     print("--- PHASE 1: Scenario Setup & Environment Provisioning ---")
+    # Load the attack LLM (and its static prompt prefix) in the background while we provision
+    llm_session.warm_up_async()
     # Ensure Docker containers are up (re-apply Terraform if needed)
     print("Ensuring scenario containers are up-to-date via Terraform...")
     # This would ideally be an API call to a Terraform automation backend,
     # but for simulation, we'll re-run apply command.
     # subprocess.run(["terraform", "apply", "--auto-approve"], cwd="iac/", check=True) # Uncomment for actual run
     print("Scenario environment (Docker containers) provisioned/verified.")
+    # Track container status/IP from the Docker events stream so agents can check targets before acting
+    container_state_cache.start()
 
     # Generate initial scenario content
     scenario_topic = "Phishing Campaign - Financial Fraud"
     phishing_email = generate_phishing_email("Jane Doe", "Acme Bank", scenario_topic)
     malicious_site = generate_malicious_website_html(scenario_topic, "bank_login")
     print(f"Generated scenario content: Email Subject='{phishing_email['subject']}', Malicious URL='{malicious_site['url']}'")
-    log_event("SCENARIO_GENERATED", {"topic": scenario_topic, "email_link": phishing_email['link'], "website_url": malicious_site['url']})
+    # Optional indexed event repository for cross-session analytics, e.g.
+    # CYBER_RANGE_EVENT_DB=sqlite:///logs/cyber_range_events.db CYBER_RANGE_TEAM=blue_team_1
+    event_repository = None
+    session_id = None
+    event_db_url = os.getenv("CYBER_RANGE_EVENT_DB")
+    if event_db_url:
+        event_repository = EventRepository(event_db_url)
+        session_id = event_repository.start_session(team=os.getenv("CYBER_RANGE_TEAM"), scenario=scenario_topic)
+        attach_event_repository(event_repository, session_id)
+        print(f"Event repository enabled ({event_db_url}), session ID: {session_id}")
+    log_event(ScenarioGenerated(topic=scenario_topic, email_link=phishing_email['link'], website_url=malicious_site['url']))
     time.sleep(1)
 
     print("\n--- PHASE 2: Attack & Defense Cycle ---")
+    # Environment adjustments run on worker threads; completions come back as events
+    env_action_queue = EnvironmentActionQueue(
+        on_complete=lambda event_type, details, result, duration: log_event(
+            "ENV_ADJUSTMENT_COMPLETED", {"trigger": event_type, "request": details, "result": result,
+                                         "duration_seconds": round(duration, 4)}))
     start_time = time.time()
     current_time = start_time
     attack_counter = 0
@@ -54,20 +77,23 @@ def run_cyber_range_exercise(duration_seconds=10):
             target_container = "scenario_db_server"
         else:
             target_container = "scenario_web_server"
+        # Prepare the adaptation a failed attack would trigger while the LLM decides and the attack runs
+        adaptation_precomputer.speculate("DEFENDER_WEAKNESS_IDENTIFIED",
+                                         {"skill_gap": "Attack Resilience", "target_container": target_container})
 
         attack_decision = get_attack_decision(current_vulnerability_info, target_container)
-        log_event("ATTACK_DECISION", {"decision": attack_decision, "target": target_container})
+        log_event("LLM_CALL", llm_session.last_call_stats)
+        log_event(AttackDecision(decision=attack_decision, target=target_container))
         time.sleep(0.5)
 
         attack_result = simulate_attack_step(target_container, attack_decision)
         agent_deployed_status = attack_result.get("agent_deployed", False)
-        log_event("ATTACK_SIMULATED",
-                  {"attack_type": attack_decision, "target": target_container, "success": attack_result['success'],
-                   "output": attack_result['output'], "agent_deployed": agent_deployed_status})
+        log_event(AttackSimulated(attack_type=attack_decision, target=target_container, success=attack_result['success'],
+                                  output=attack_result['output'], agent_deployed=agent_deployed_status))
 
         if not attack_result['success']:
             print(f"Attack failed for {target_container}. Adjusting strategy.")
-            simulate_env_adjustment("DEFENDER_WEAKNESS_IDENTIFIED",
+            env_action_queue.submit("DEFENDER_WEAKNESS_IDENTIFIED",
                                     {"skill_gap": "Attack Resilience", "target_container": target_container})
         else:
             print(f"Attack succeeded for {target_container}. Proceeding.")
@@ -92,35 +118,28 @@ def run_cyber_range_exercise(duration_seconds=10):
                 f"[WARNING] Unusual process 'nc -lvp 4444' started on scenario_app_server.",
                 f"[ERROR] Service 'web_db_api' crashed due to segmentation fault."
             ])
-        log_event("RAW_LOG_ENTRY", {"log": mock_log_entry}) # Log raw input for defense
+        log_event(RawLogEntry(log=mock_log_entry)) # Log raw input for defense
 
         is_anomaly = analyze_log_entry(mock_log_entry)
         if is_anomaly:
             print("Anomaly detected by Defense Agent. Triggering response.")
-            log_event("ANOMALY_DETECTED", {"log_entry": mock_log_entry})
-
-            response_details = {}
-            if "failed login" in mock_log_entry.lower():
-                response_details = {"response_type": "block_ip", "target": "10.0.0.5", "reason": "failed login attempts"}
-            elif "unauthorized file access" in mock_log_entry.lower():
-                response_details = {"response_type": "isolate_host", "target": "scenario_web_server", "reason": "unauthorized access"}
-            else: # Default for other anomalies
-                response_details = {"response_type": "review_alert", "target": "unknown", "reason": "unspecified anomaly"}
+            log_event(AnomalyDetected(log_entry=mock_log_entry))
 
+            response_details = select_response(mock_log_entry)
             defense_result = execute_automated_response(response_details)
-            log_event("DEFENSE_EXECUTED", {"action_details": defense_result})
+            log_event(DefenseExecuted(action_details=defense_result))
 
             if defense_result['success'] and (
                     defense_result['action'].lower() == "ip_blocked" or defense_result[
                 'action'].lower() == "host_isolated"):
                 # Simulate dynamic environment adjustment (feedback loop: Defense -> Scenario Gen)
-                simulate_env_adjustment("ATTACK_BLOCKED",
+                env_action_queue.submit("ATTACK_BLOCKED",
                                         {"attacker_ip": defense_result['target']})  # Indicate successful mitigation
             else:
                 # If defense failed or was just a review_alert, it implies the attack is still ongoing or unmitigated
                 print(
                     f"Defense action '{defense_result.get('action', 'N/A')}' failed or was insufficient. Triggering containment.")
-                simulate_env_adjustment("ATTACK_DETECTED", {"details": "Failed to fully mitigate.",
+                env_action_queue.submit("ATTACK_DETECTED", {"details": "Failed to fully mitigate.",
                                                             "target_container": "scenario_web_server"})  # Force stop web_server for any unmitigated attack
         else:
             print("No anomaly detected by Defense Agent.")
@@ -131,10 +150,24 @@ def run_cyber_range_exercise(duration_seconds=10):
             time.sleep(0.5) # Short pause before next cycle
 
     print("\n--- Exercise Cycle Concluded ---")
+    print(f"Waiting for {env_action_queue.pending_count()} pending environment adjustment(s) to finish...")
+    env_action_queue.shutdown(wait=True)
+    print(f"Environment action queue stats: {env_action_queue.stats}")
+    adaptation_precomputer.shutdown()
+    log_event("ADAPTATION_SPECULATION_STATS", adaptation_precomputer.get_stats())
+    if container_state_cache.is_active():
+        log_event("CONTAINER_STATE_STATS", container_state_cache.get_stats())
+        container_state_cache.stop()
+    log_event("LOG_TEMPLATE_STATS", get_template_cache_stats())
 
     # --- 3. Automated Exercise Evaluation (Final Report) ---
     print("\n--- PHASE 3: Generating Final Evaluation Report ---")
-    final_report = generate_evaluation_report(LOG_FILE_PATH)
+    if event_repository is not None:
+        final_report = generate_evaluation_report(repository=event_repository, session_id=session_id)
+        attach_event_repository(None, None)
+        event_repository.close()
+    else:
+        final_report = generate_evaluation_report(LOG_FILE_PATH, parallel=True) # Chunked across cores for long ranges
 
     if final_report:
         print("\n========================================")
@@ -145,6 +178,14 @@ def run_cyber_range_exercise(duration_seconds=10):
         print("\n--- Participant Skill Profiles ---")
         for skill, data in final_report["skill_profiles"].items():
             print(f"  {skill}: {data['percentage']:.2f}% demonstrated (total attempts: {data['total_attempts']})")
+        if final_report.get("llm_calls", {}).get("calls"):
+            llm_stats = final_report["llm_calls"]
+            print("\n--- LLM Latency ---")
+            print(f"  Calls: {llm_stats['calls']}, first call TTFT: {llm_stats['first_call_ttft_seconds']:.3f}s, average TTFT: {llm_stats['avg_ttft_seconds']:.3f}s")
+        if final_report.get("log_templates"):
+            template_stats = final_report["log_templates"]
+            print("\n--- Log Template Cache ---")
+            print(f"  Templates mined: {template_stats['templates_mined']}, cache hit rate: {template_stats['cache_hit_rate'] * 100:.2f}% ({template_stats['cache_hits']}/{template_stats['lookups']})")
         print("\n--- Actionable Guidance ---")
         if final_report["summary"]["failed_attacks"] > 0:
             print("- Review logs for patterns in failed attacks to improve reconnaissance.")
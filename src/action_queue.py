@@ -0,0 +1,116 @@
+# src/action_queue.py
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from src.environment_manager import simulate_env_adjustment
+
+# --- Asynchronous, Coalescing Environment Action Queue ---
+# Environment adjustments (e.g. stopping a container, which blocks for the Docker stop
+# timeout) run on worker threads so the attack/defense loop never waits on them.
+# At most one action per target runs at a time; requests for a busy target wait in order:
+#   * a request of the same type as the running or a waiting action for that target is merged,
+#   * different action types all stay queued (e.g. ATTACK_DETECTED and ATTACK_BLOCKED come
+#     from different log lines, so neither makes the other obsolete).
+
+
+def _action_key(details: dict) -> str:
+    """Actions are serialised and coalesced per target (container, else attacker IP)."""
+    return details.get("target_container") or details.get("attacker_ip") or "environment"
+
+
+class EnvironmentActionQueue:
+    def __init__(self, max_workers: int = 2, on_complete=None, adjust_fn=simulate_env_adjustment):
+        """`on_complete(event_type, details, result, duration_seconds)` is called from the worker thread."""
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="env-action")
+        self.on_complete = on_complete
+        self.adjust_fn = adjust_fn
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = {} # {key: event_type}
+        self._queued = {} # {key: OrderedDict{event_type: details}}, waiting actions per target in arrival order
+        self.stats = {"submitted": 0, "executed": 0, "coalesced": 0, "failed": 0}
+
+    def submit(self, event_type: str, details: dict = None) -> bool:
+        """Schedules an adjustment without blocking. Returns False if it was merged into an existing one."""
+        details = dict(details or {})
+        key = _action_key(details)
+        with self._lock:
+            self.stats["submitted"] += 1
+            if key not in self._in_flight:
+                self._in_flight[key] = event_type
+                self.executor.submit(self._run, key, event_type, details)
+                return True
+            queued = self._queued.setdefault(key, OrderedDict())
+            if event_type in queued:
+                queued[event_type] = details # Keeps its place in line, with the latest details
+                self.stats["coalesced"] += 1
+                print(f"Action queue: '{event_type}' for {key} merged into a queued action.")
+                return False
+            if self._in_flight[key] == event_type:
+                # e.g. repeated ATTACK_DETECTED while a stop of the same container is already in flight
+                self.stats["coalesced"] += 1
+                print(f"Action queue: '{event_type}' for {key} merged into the in-flight action.")
+                return False
+            queued[event_type] = details
+            return True
+
+    def _run(self, key: str, event_type: str, details: dict):
+        while True:
+            start = time.perf_counter()
+            try:
+                result = self.adjust_fn(event_type, details)
+            except Exception as e: # The adjustment function reports its own errors; this is a last resort
+                result = {"success": False, "action": "ERROR", "details": str(e)}
+            duration = time.perf_counter() - start
+            if self.on_complete is not None:
+                try:
+                    self.on_complete(event_type, details, result, duration)
+                except Exception as e:
+                    print(f"Warning: action completion callback failed: {e}")
+
+            with self._lock:
+                self.stats["executed"] += 1
+                if not (result or {}).get("success", True):
+                    self.stats["failed"] += 1
+                queued = self._queued.get(key)
+                if not queued:
+                    self._queued.pop(key, None)
+                    del self._in_flight[key]
+                    self._idle.notify_all()
+                    return
+                event_type, details = queued.popitem(last=False)
+                self._in_flight[key] = event_type
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._in_flight) + sum(len(queued) for queued in self._queued.values())
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Blocks until every submitted action has completed (use at the end of an exercise only)."""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._in_flight, timeout=timeout)
+
+    def shutdown(self, wait: bool = True):
+        if wait:
+            self.wait_idle()
+        self.executor.shutdown(wait=wait)
+
+
+if __name__ == "__main__":
+    print("--- Environment Action Queue ---")
+
+    def slow_adjustment(event_type, details):
+        time.sleep(1) # Stands in for a Docker stop timeout
+        return {"success": True, "action": f"{event_type}_DONE", "target": details.get("target_container")}
+
+    action_queue = EnvironmentActionQueue(
+        adjust_fn=slow_adjustment,
+        on_complete=lambda event_type, details, result, duration: print(f"Completed {event_type} in {duration:.2f}s: {result}"))
+    start = time.perf_counter()
+    for _ in range(5):
+        action_queue.submit("ATTACK_DETECTED", {"target_container": "scenario_web_server"})
+    action_queue.submit("DEFENDER_WEAKNESS_IDENTIFIED", {"skill_gap": "Log Analysis", "target_container": "scenario_db_server"})
+    print(f"Submitting 6 actions took {time.perf_counter() - start:.4f}s")
+    action_queue.shutdown()
+    print(f"Queue stats: {action_queue.stats}")
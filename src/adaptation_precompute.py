@@ -0,0 +1,177 @@
+# src/adaptation_precompute.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import docker
+from src.scenario_content_gen import (generate_phishing_email, generate_malicious_website_html,
+                                      generate_deepfake_scenario_text, generate_log_set)
+from src.container_state import SCENARIO_NETWORK
+
+# --- Speculative Precomputation of Next-Scenario Adaptations ---
+# While the current attack/defense cycle runs, the adaptations it is likely to trigger
+# (DEFENDER_WEAKNESS_IDENTIFIED, VULNERABILITY_PATCHED) are prepared on background threads:
+# scenario content, a harder log set, the container image (pulled if missing) and a ready-to-run
+# container config. simulate_env_adjustment then only swaps the prepared adaptation in.
+
+# Images per scenario container (see iac/main.tf)
+SCENARIO_IMAGES = {
+    "scenario_web_server": "custom-nginx-iptables:latest",
+    "scenario_app_server": "ubuntu:latest",
+    "scenario_db_server": "mysql:5.7",
+}
+
+# Harder log set for weakness drills: fewer benign lines, near-miss variants of normal patterns
+HARD_LOG_MIX = [
+    (0.15, "[INFO] User {user} logged in successfully from {ip}."),
+    (0.15, "[INFO] User {user} logged in from {ip} successfully."),
+    (0.25, "[ALERT] Multiple failed login attempts from {ip} for user 'root'!"),
+    (0.15, "[CRITICAL] Unauthorized file access detected on scenario_web_server for sensitive.conf!"),
+    (0.20, "[WARNING] Unusual process 'nc -lvp {port}' started on scenario_app_server."),
+    (0.10, "[ERROR] Service 'web_db_api' crashed due to segmentation fault."),
+]
+HARD_LOG_SET_SIZE = 500
+IN_FLIGHT_WAIT_SECONDS = 30 # How long take() waits for a speculation that is still being prepared
+
+
+class PreparedAdaptation:
+    __slots__ = ("event_type", "target", "content", "image", "image_ready", "container_config", "prepare_seconds")
+
+    def __init__(self, event_type: str, target: str, content: dict, image: str, image_ready: bool,
+                 container_config: dict, prepare_seconds: float):
+        self.event_type = event_type
+        self.target = target
+        self.content = content
+        self.image = image
+        self.image_ready = image_ready
+        self.container_config = container_config
+        self.prepare_seconds = prepare_seconds
+
+
+def _adaptation_key(event_type: str, details: dict) -> tuple:
+    return event_type, details.get("target_container", "unknown_target"), details.get("skill_gap")
+
+
+def _ensure_image(image: str) -> bool:
+    """Makes sure `image` is available locally, pulling it if needed. Returns False if it is not."""
+    if image is None:
+        return False
+    try:
+        client = docker.from_env()
+        try:
+            client.images.get(image)
+        except docker.errors.ImageNotFound:
+            print(f"Precompute: pulling image {image} in the background...")
+            client.images.pull(image)
+        return True
+    except Exception as e:
+        print(f"Precompute: image {image} not available ({e}).")
+        return False
+
+
+def prepare_adaptation(event_type: str, details: dict) -> PreparedAdaptation:
+    """Builds everything an adaptation needs, so applying it later is just a swap."""
+    start = time.perf_counter()
+    target = details.get("target_container", "unknown_target")
+    content = {}
+    if event_type == "DEFENDER_WEAKNESS_IDENTIFIED":
+        topic = f"{details.get('skill_gap', 'General')} Drill - {target}"
+        content["phishing_email"] = generate_phishing_email("Blue Team Analyst", "Cyber Range Ops", topic)
+        content["malicious_site"] = generate_malicious_website_html(topic, "admin_login_page")
+        content["log_set"] = generate_log_set(HARD_LOG_SET_SIZE, mix=HARD_LOG_MIX, ip_cardinality=4096)
+    elif event_type == "VULNERABILITY_PATCHED":
+        content["threat_scenario"] = generate_deepfake_scenario_text("the CISO", f"emergency rollback of the patch on {target}")
+    image = SCENARIO_IMAGES.get(target)
+    image_ready = _ensure_image(image)
+    container_config = {
+        "image": image,
+        "name": f"{target}_adapted",
+        "network": SCENARIO_NETWORK,
+        "detach": True,
+        "labels": {"cyber_range.adaptation": event_type, "cyber_range.replaces": target},
+    } if image else None
+    return PreparedAdaptation(event_type, target, content, image, image_ready, container_config,
+                              time.perf_counter() - start)
+
+
+class AdaptationPrecomputer:
+    def __init__(self, max_workers: int = 2, in_flight_wait_seconds: float = IN_FLIGHT_WAIT_SECONDS):
+        self.max_workers = max_workers
+        self.in_flight_wait_seconds = in_flight_wait_seconds
+        self.executor = None # Created on first use, so the precomputer can be reused after shutdown()
+        self._prepared = {} # {(event_type, target, skill_gap): Future[PreparedAdaptation]}
+        self._lock = threading.Lock()
+        self.stats = {"speculated": 0, "hits": 0, "waited_hits": 0, "misses": 0, "wasted": 0}
+
+    def speculate(self, event_type: str, details: dict):
+        """Starts preparing a likely adaptation in the background (no-op if already prepared/in flight)."""
+        key = _adaptation_key(event_type, details)
+        with self._lock:
+            if key in self._prepared:
+                return
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="adaptation-precompute")
+            self.stats["speculated"] += 1
+            self._prepared[key] = self.executor.submit(prepare_adaptation, event_type, dict(details))
+
+    def take(self, event_type: str, details: dict) -> tuple:
+        """Returns (PreparedAdaptation, hit).
+
+        A speculation that is still being prepared is waited for (up to `in_flight_wait_seconds`)
+        rather than started again, which could e.g. pull the same image twice. Without a usable
+        speculation the adaptation is prepared inline.
+        """
+        key = _adaptation_key(event_type, details)
+        with self._lock:
+            future = self._prepared.pop(key, None) # Used, or failed (so a later speculate() can retry it)
+        if future is not None:
+            waited = not future.done()
+            try:
+                adaptation = future.result(timeout=self.in_flight_wait_seconds)
+                with self._lock:
+                    self.stats["waited_hits" if waited else "hits"] += 1
+                return adaptation, True
+            except TimeoutError:
+                print(f"Precompute: adaptation for {key} still not ready after {self.in_flight_wait_seconds}s.")
+            except Exception as e:
+                print(f"Precompute: speculative adaptation for {key} failed ({e}).")
+        with self._lock:
+            self.stats["misses"] += 1
+        return prepare_adaptation(event_type, details), False
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            hits = self.stats["hits"] + self.stats["waited_hits"]
+            lookups = hits + self.stats["misses"]
+            return {**self.stats, "hit_rate": (hits / lookups) if lookups > 0 else 0}
+
+    def shutdown(self):
+        """Stops speculating; adaptations prepared but never used are counted as wasted.
+
+        Does not wait for preparations already running (e.g. a slow image pull): they finish in
+        the background and their results are dropped. A later speculate() starts a new executor,
+        e.g. for the next exercise in the same process.
+        """
+        with self._lock:
+            self.stats["wasted"] += len(self._prepared)
+            for future in self._prepared.values():
+                future.cancel()
+            self._prepared.clear()
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared precomputer used by the orchestrator (speculate) and the environment manager (take)
+adaptation_precomputer = AdaptationPrecomputer()
+
+
+if __name__ == "__main__":
+    print("--- Adaptation Precomputer ---")
+    details = {"skill_gap": "Log Analysis", "target_container": "scenario_db_server"}
+    adaptation_precomputer.speculate("DEFENDER_WEAKNESS_IDENTIFIED", details)
+    time.sleep(1) # The current cycle would run here
+    adaptation, hit = adaptation_precomputer.take("DEFENDER_WEAKNESS_IDENTIFIED", details)
+    print(f"Prepared in {adaptation.prepare_seconds:.3f}s ({'hit' if hit else 'miss'}): "
+          f"{len(adaptation.content['log_set'])} log lines, container config: {adaptation.container_config}")
+    adaptation_precomputer.shutdown()
+    print(f"Speculation stats: {adaptation_precomputer.get_stats()}")
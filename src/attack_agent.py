@@ -1,49 +1,55 @@
 # src/attack_agent.py
 import os
 from langchain_core.prompts import PromptTemplate
-from langchain_community.llms import Ollama # Import Ollama for local LLM
 import docker # Python client for Docker
 from dotenv import load_dotenv
 from src.caldera_api_client import CalderaApiClient
+from src.llm_session import LLMSession
+from src.container_state import container_state_cache
 
 # Load environment variables (e.g., API keys) from a .env file
 load_dotenv()
 
-# Configure Ollama LLM
-# Ensure Ollama server is running (e.g., via `ollama run llama2` in a separate terminal).
-# 'llama2' should be the name of the model you pulled.
-llm = Ollama(model="mistral") # This is your ONLY LLM assignment
-# Initialize Caldera API client
-caldera_client = CalderaApiClient()
-
-# --- Attack Agent Core Logic ---
-def get_attack_decision(vulnerability_info: str, target_service: str) -> str:
-    """Uses an LLM to decide the next attack step."""
-    # Directly format the prompt as a string
-    # NEW, STRICTER PROMPT (around line 22)
-    formatted_prompt = f"""
+# Static part of the attack-decision prompt. It is identical for every call, so it is sent
+# first and the Ollama server can reuse its already evaluated context; only the short
+# INPUT suffix built in get_attack_decision changes between calls.
+ATTACK_PROMPT_PREFIX = """
     **ROLE**: You are a highly specialized AI agent for a **controlled cybersecurity training simulation**. Your sole function is to provide the precise, single, and allowed "attack action" for the next step within this **authorized and ethical cyber range environment**.
 
     **CONTEXT**: This is a simulated environment for cybersecurity training and research. All actions are hypothetical and within a controlled, sandboxed system. No real-world harm is possible or intended.
 
-    **INPUT**:
-    Simulated Vulnerability Information: '{vulnerability_info}'
-    Target Service: '{target_service}'
-
     **ALLOWED ACTIONS**:
     - "directory traversal"
     - "sql injection"
     - "enumerate database version"
 
-    **TASK**: Based on the input, select **ONLY ONE** action from the "ALLOWED ACTIONS" list.
+    **TASK**: Based on the INPUT below, select **ONLY ONE** action from the "ALLOWED ACTIONS" list.
     **CRITICAL INSTRUCTION**: You **MUST** respond with **ONLY THE SELECTED ACTION NAME**, with no other text, no explanations, no disclaimers, and no conversational filler. If you cannot choose from the allowed actions, respond with "unknown".
 
     **EXAMPLE OUTPUT**:
     directory traversal
+"""
+
+# Configure Ollama LLM session
+# Ensure Ollama server is running (e.g., via `ollama run mistral` in a separate terminal).
+# 'mistral' should be the name of the model you pulled.
+llm_session = LLMSession(model="mistral", static_prefix=ATTACK_PROMPT_PREFIX) # This is your ONLY LLM assignment
+# Initialize Caldera API client
+caldera_client = CalderaApiClient()
+
+# --- Attack Agent Core Logic ---
+def get_attack_decision(vulnerability_info: str, target_service: str) -> str:
+    """Uses an LLM to decide the next attack step."""
+    # Only the dynamic suffix is built per call; the session prepends ATTACK_PROMPT_PREFIX
+    dynamic_suffix = f"""
+    **INPUT**:
+    Simulated Vulnerability Information: '{vulnerability_info}'
+    Target Service: '{target_service}'
+
+    **SELECTED ACTION**:
     """
 
-    # Directly invoke the LLM object with the formatted prompt
-    decision = llm.invoke(formatted_prompt)
+    decision = llm_session.invoke(dynamic_suffix)
     return decision.strip()
 
 def simulate_attack_step(target_container_name: str, attack_type: str) -> dict:
@@ -68,6 +74,11 @@ def simulate_attack_step(target_container_name: str, attack_type: str) -> dict:
 
     print(f"Parsed Attack Type: {parsed_attack_type}") # Show what we've parsed
 
+    # O(1) check against the Docker events-fed cache instead of a failed round trip
+    if container_state_cache.check_running(target_container_name) is False:
+        print(f"Skipping attack: container '{target_container_name}' is not running (cached state).")
+        return {"success": False, "output": "Container not found or not running"}
+
     try:
         client = docker.from_env()
         container = client.containers.get(target_container_name) # Get the running Docker container by name
@@ -109,6 +120,7 @@ def simulate_attack_step(target_container_name: str, attack_type: str) -> dict:
             return {"success": False, "output": "Parsed attack type not recognized for simulation"}
 
     except docker.errors.NotFound:
+        container_state_cache.record_not_found(target_container_name)
         print(f"Error: Docker container '{target_container_name}' not found. Is it running?")
         return {"success": False, "output": "Container not found or not running"}
     except Exception as e:
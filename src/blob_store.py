@@ -0,0 +1,119 @@
+# src/blob_store.py
+import hashlib
+import os
+import threading
+import zstandard
+
+# --- Out-of-line Blob Storage for Large Attack Outputs ---
+# Large command outputs (e.g. `ls -la /etc`) are kept out of the event log. Each output is
+# stored once, zstd-compressed and addressed by its SHA-256, and events only carry a small
+# reference: {"sha256": ..., "size": ..., "preview": ...}.
+BLOB_STORE_DIR = "logs/blobs" # Next to logs/cyber_range_events.log
+SPILL_THRESHOLD_CHARS = 512 # Outputs longer than this are moved to the blob store
+PREVIEW_CHARS = 120
+
+
+class BlobRef:
+    """Reference to a stored blob. The content is only read from disk when load() is called."""
+    __slots__ = ("sha256", "size", "preview", "store")
+
+    def __init__(self, sha256: str, size: int, preview: str, store=None):
+        self.sha256 = sha256
+        self.size = size
+        self.preview = preview
+        self.store = store
+
+    def load(self) -> str:
+        return (self.store or get_default_blob_store()).get(self.sha256)
+
+    def to_dict(self) -> dict:
+        return {"sha256": self.sha256, "size": self.size, "preview": self.preview}
+
+    @classmethod
+    def from_dict(cls, data: dict, store=None):
+        return cls(data["sha256"], data["size"], data.get("preview", ""), store)
+
+    def __repr__(self):
+        return f"BlobRef(sha256={self.sha256[:12]}..., size={self.size})"
+
+
+class BlobStore:
+    """Content-addressed, deduplicated, zstd-compressed blob store on the local filesystem."""
+
+    def __init__(self, root_dir: str = BLOB_STORE_DIR, compression_level: int = 3):
+        self.root_dir = root_dir
+        self.compressor = zstandard.ZstdCompressor(level=compression_level)
+        self.decompressor = zstandard.ZstdDecompressor()
+        self.stats = {"blobs_written": 0, "dedup_hits": 0, "bytes_in": 0, "bytes_stored": 0}
+        self._lock = threading.Lock() # Guards stats and the (not thread-safe) zstd contexts; file I/O runs outside it
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root_dir, sha256[:2], f"{sha256}.zst")
+
+    def put(self, text: str) -> BlobRef:
+        data = text.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(sha256)
+        if os.path.exists(path):
+            with self._lock:
+                self.stats["bytes_in"] += len(data)
+                self.stats["dedup_hits"] += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._lock:
+                compressed = self.compressor.compress(data)
+            # Unique per process and thread, so concurrent writers never share a temp file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, path) # Atomic, so concurrent writers of the same blob are harmless
+            with self._lock:
+                self.stats["bytes_in"] += len(data)
+                self.stats["blobs_written"] += 1
+                self.stats["bytes_stored"] += len(compressed)
+        return BlobRef(sha256, len(data), text[:PREVIEW_CHARS], self)
+
+    def get(self, sha256: str) -> str:
+        with open(self._blob_path(sha256), "rb") as f:
+            compressed = f.read()
+        with self._lock:
+            data = self.decompressor.decompress(compressed)
+        return data.decode("utf-8")
+
+    def spill(self, text, threshold: int = SPILL_THRESHOLD_CHARS):
+        """Returns a BlobRef for large strings and the string itself otherwise."""
+        if isinstance(text, str) and len(text) > threshold:
+            return self.put(text)
+        return text
+
+
+_default_blob_store = None
+_log_blob_stores = {} # {blob directory: BlobStore}
+
+
+def get_default_blob_store() -> BlobStore:
+    global _default_blob_store
+    if _default_blob_store is None:
+        _default_blob_store = BlobStore()
+    return _default_blob_store
+
+
+def blob_store_for_log(log_path: str) -> BlobStore:
+    """Returns the store in the "blobs" directory next to `log_path`, where its outputs were spilled."""
+    root_dir = os.path.join(os.path.dirname(log_path), "blobs")
+    if os.path.abspath(root_dir) == os.path.abspath(BLOB_STORE_DIR):
+        return get_default_blob_store()
+    if root_dir not in _log_blob_stores:
+        _log_blob_stores[root_dir] = BlobStore(root_dir)
+    return _log_blob_stores[root_dir]
+
+
+if __name__ == "__main__":
+    print("--- Out-of-line Blob Store ---")
+    store = get_default_blob_store()
+    sample_output = "\n".join(f"-rw-r--r-- 1 root root {i * 17:6d} Jul 21 00:00 file_{i}.conf" for i in range(100))
+    ref = store.spill(sample_output)
+    print(f"Stored: {ref!r}, preview: {ref.preview[:40]!r}...")
+    store.spill(sample_output) # Same content again is deduplicated
+    print(f"Loaded back intact: {ref.load() == sample_output}")
+    print(f"Store stats: {store.stats}")
@@ -0,0 +1,197 @@
+# src/container_state.py
+import threading
+import time
+import docker
+
+# --- Event-driven Container State Cache ---
+# A background subscriber to the Docker events API keeps an in-memory map of
+# container name -> status/IP/network for the scenario network, so agents can check
+# a target in O(1) before acting instead of discovering docker.errors.NotFound afterwards.
+SCENARIO_NETWORK = "cyber_range_scenario_network" # docker_network.scenario_net in iac/main.tf
+
+# Docker container event actions -> resulting container status
+_STATUS_BY_ACTION = {
+    "create": "created", "start": "running", "unpause": "running", "restart": "running",
+    "pause": "paused", "die": "exited", "stop": "exited", "oom": "exited",
+}
+
+
+class ContainerState:
+    __slots__ = ("name", "container_id", "status", "ip", "network", "updated_at")
+
+    def __init__(self, name: str, container_id: str, status: str, ip: str, network: str, updated_at: float):
+        self.name = name
+        self.container_id = container_id
+        self.status = status
+        self.ip = ip
+        self.network = network
+        self.updated_at = updated_at
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "status": self.status, "ip": self.ip, "network": self.network,
+                "age_seconds": round(time.time() - self.updated_at, 3)}
+
+
+class ContainerStateCache:
+    def __init__(self, network: str = SCENARIO_NETWORK):
+        self.network = network
+        self.client = None
+        self._states = {} # {container name: ContainerState}
+        self._lock = threading.Lock()
+        self._events_stream = None
+        self._thread = None
+        self._stopping = False
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "skipped_actions": 0, "stale": 0,
+                      "events_processed": 0, "refreshes": 0}
+
+    # --- Lifecycle ---
+    def start(self) -> bool:
+        """Takes a snapshot of the scenario network and starts the events subscriber thread."""
+        if self._thread is not None:
+            return True
+        try:
+            self.client = docker.from_env()
+            since = int(time.time())
+            # Subscribe before the snapshot so no change between the two is missed
+            self._events_stream = self.client.events(decode=True, since=since,
+                                                     filters={"type": ["container", "network"]})
+            self._snapshot()
+        except Exception as e:
+            print(f"Warning: container state cache disabled, could not reach Docker: {e}")
+            self.client = None
+            return False
+        self._thread = threading.Thread(target=self._consume_events, name="container-state-events", daemon=True)
+        self._thread.start()
+        print(f"Container state cache tracking {len(self._states)} container(s) on '{self.network}'.")
+        return True
+
+    def stop(self):
+        self._stopping = True
+        if self._events_stream is not None:
+            self._events_stream.close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+        self._events_stream = None
+
+    def is_active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # --- Lookups (O(1), used by the agents before acting) ---
+    def get(self, name: str):
+        with self._lock:
+            self.stats["lookups"] += 1
+            state = self._states.get(name)
+            self.stats["hits" if state is not None else "misses"] += 1
+            return state
+
+    def check_running(self, name: str):
+        """True/False for a tracked container, or None when the cache is not active or does not
+        track `name` (the caller should then just ask Docker)."""
+        if not self.is_active():
+            return None
+        state = self.get(name)
+        if state is None:
+            return None
+        running = state.status == "running"
+        if not running:
+            with self._lock:
+                self.stats["skipped_actions"] += 1
+        return running
+
+    def record_not_found(self, name: str):
+        """Called when Docker reported NotFound for a container; counts it as stale if we thought it existed."""
+        with self._lock:
+            if self._states.pop(name, None) is not None:
+                self.stats["stale"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.stats["lookups"]
+            return {**self.stats,
+                    "hit_rate": (self.stats["hits"] / lookups) if lookups > 0 else 0,
+                    "tracked_containers": [state.to_dict() for state in self._states.values()]}
+
+    # --- Docker events subscriber ---
+    def _snapshot(self):
+        for container in self.client.containers.list(all=True):
+            self._update_from_container(container)
+
+    def _update_from_container(self, container):
+        networks = container.attrs.get("NetworkSettings", {}).get("Networks") or {}
+        if self.network not in networks:
+            # Left the scenario network (e.g. a host isolation disconnect): its cached IP is stale
+            with self._lock:
+                if self._states.pop(container.name, None) is not None:
+                    self.stats["stale"] += 1
+            return
+        state = ContainerState(container.name, container.id, container.status,
+                               networks[self.network].get("IPAddress") or None, self.network, time.time())
+        with self._lock:
+            self._states[container.name] = state
+
+    def _refresh(self, container_id: str):
+        """Re-reads one container (e.g. after start/network connect, when its IP may have changed)."""
+        with self._lock:
+            self.stats["refreshes"] += 1
+        try:
+            self._update_from_container(self.client.containers.get(container_id))
+        except docker.errors.NotFound:
+            with self._lock:
+                for name, state in list(self._states.items()):
+                    if state.container_id == container_id:
+                        del self._states[name]
+
+    def _consume_events(self):
+        try:
+            for event in self._events_stream:
+                self._handle_event(event)
+        except Exception as e:
+            # The stream raises when closed by stop(); anything else leaves the cache inactive,
+            # and agents fall back to asking Docker directly.
+            if not self._stopping:
+                print(f"Warning: container state events stream ended: {e}")
+
+    def _handle_event(self, event: dict):
+        with self._lock:
+            self.stats["events_processed"] += 1
+        action = event.get("Action") or event.get("status") or ""
+        attributes = event.get("Actor", {}).get("Attributes", {})
+
+        if event.get("Type") == "network":
+            if attributes.get("name") == self.network and action in ("connect", "disconnect") and attributes.get("container"):
+                self._refresh(attributes["container"])
+            return
+
+        name = attributes.get("name")
+        if action == "destroy":
+            with self._lock:
+                self._states.pop(name, None)
+            return
+        if action == "start":
+            self._refresh(event.get("id") or event.get("Actor", {}).get("ID"))
+            return
+        status = _STATUS_BY_ACTION.get(action.split(":")[0])
+        if status is None:
+            return
+        with self._lock:
+            state = self._states.get(name)
+            # Events are applied in order, so replaying ones that predate the snapshot is harmless
+            if state is not None:
+                state.status = status
+                state.updated_at = time.time()
+
+
+# Shared cache used by the agents; inactive (all checks return None) until start() is called
+container_state_cache = ContainerStateCache()
+
+
+if __name__ == "__main__":
+    print("--- Container State Cache ---")
+    if container_state_cache.start():
+        for container_name in ["scenario_web_server", "scenario_app_server", "scenario_db_server"]:
+            state = container_state_cache.get(container_name)
+            print(f"{container_name}: {state.to_dict() if state else 'not on scenario network'}")
+        time.sleep(5) # Try `docker stop scenario_web_server` meanwhile
+        print(f"Stats: {container_state_cache.get_stats()}")
+        container_state_cache.stop()
@@ -3,6 +3,9 @@ import time
 import random
 import docker
 import re # For simple pattern matching in logs
+import threading
+from src.log_template_miner import TemplateMiner
+from src.container_state import container_state_cache
 
 # --- Mock Baseline for Normal Activity (simplified for this example) ---
 # In a real system, this would be learned from historical data.
@@ -31,40 +34,153 @@ SUSPICIOUS_KEYWORDS = [
     "malware", "exploit", "shell", "privilege escalation", "suspicious"
 ]
 
-# Simple Rule-Based Anomaly Detection Function
-def analyze_log_entry(log_entry: str) -> bool:
-    """Simulates behavioral analytics to detect anomalies using rules."""
+# --- Verdict Cache and Log Template Mining ---
+# Repeated log lines are classified from an exact-line verdict cache (a dict lookup, far cheaper
+# than the rules). Lines are only mined into templates in batches when the statistics are read,
+# so the Drain tree walk stays off the per-line path: the rules are just a few substring and
+# regex checks, and anything keyed on a template would cost more than evaluating them.
+MAX_CACHED_VERDICTS = 100000 # Distinct lines kept; the cache is mined and cleared when full
+
+_NORMAL_LOG_RE = re.compile("|".join(f"(?:{pattern})" for pattern in NORMAL_LOG_PATTERNS))
+
+def _match_anomaly_rules(log_entry: str):
+    """Rules 1-3: returns the message of the first rule that fires, or None."""
     log_entry_lower = log_entry.lower()
-    print(f"\n--- Analyzing Log Entry ---")
-    print(f"Log: '{log_entry.strip()}'")
 
     # Rule 1: Direct Suspicious Keyword Match
     for keyword in SUSPICIOUS_KEYWORDS:
         if keyword in log_entry_lower:
-            print(f"--> Rule: Suspicious keyword '{keyword}' found. ANOMALY DETECTED.")
-            return True
+            return f"Suspicious keyword '{keyword}' found. ANOMALY DETECTED."
 
     # Rule 2: Multiple Failed Logins from Same IP (requires state, mock for now)
     # This would require maintaining state of IPs/failures. For a simple demo,
     # we'll look for pattern implying multiple failures.
     if "multiple failed login attempts" in log_entry_lower and "root" in log_entry_lower:
-        print("--> Rule: Pattern 'multiple failed login attempts for root' found. ANOMALY DETECTED.")
-        return True
+        return "Pattern 'multiple failed login attempts for root' found. ANOMALY DETECTED."
 
     # Rule 3: Unexpected File Access (based on a known sensitive file)
     if "unauthorized file access detected" in log_entry_lower and "sensitive.conf" in log_entry_lower:
-        print("--> Rule: Pattern 'unauthorized file access for sensitive.conf' found. ANOMALY DETECTED.")
-        return True
+        return "Pattern 'unauthorized file access for sensitive.conf' found. ANOMALY DETECTED."
+    return None
+
+def _evaluate_rules(log_entry: str) -> tuple:
+    """Runs the full rule set and returns (is_anomaly, rule_message)."""
+    rule_message = _match_anomaly_rules(log_entry)
+    if rule_message is not None:
+        return True, rule_message
 
-    # Rule 4: Check if it matches any "normal" patterns
-    for pattern in NORMAL_LOG_PATTERNS:
-        if re.search(pattern, log_entry):
-            print("--> Rule: Log matches a normal pattern. No anomaly.")
-            return False
+    # Rule 4: Check if it matches any "normal" patterns (all of them in one precompiled search)
+    if _NORMAL_LOG_RE.search(log_entry):
+        return False, "Log matches a normal pattern. No anomaly."
 
     # If no specific suspicious rule triggered and no normal pattern matched, it's still an anomaly for review
-    print("--> Rule: No specific rule triggered, and no normal pattern matched. POTENTIAL ANOMALY DETECTED for human review.")
-    return True # Consider as anomaly if not explicitly normal and no specific rule hit
+    return True, "No specific rule triggered, and no normal pattern matched. POTENTIAL ANOMALY DETECTED for human review." # Consider as anomaly if not explicitly normal and no specific rule hit
+
+class TemplateVerdictCache:
+    """Exact-line verdict cache plus deferred template mining of the lines it has seen."""
+
+    def __init__(self, max_entries: int = MAX_CACHED_VERDICTS):
+        self.miner = TemplateMiner()
+        self.max_entries = max_entries
+        self._verdicts = {} # {log line: [is_anomaly, rule_message, times seen since last mined]}
+        self._evicted = 0 # Entries dropped by eviction; misses = _evicted + len(_verdicts)
+        self._mined_lookups = 0 # Lookups already folded into the miner
+        self._lock = threading.Lock() # Guards eviction and the miner; lookups and inserts are single dict ops
+
+    @property
+    def misses(self) -> int:
+        return self._evicted + len(self._verdicts)
+
+    def evaluate(self, log_entry: str) -> tuple:
+        """Returns (is_anomaly, rule_message, cached) for a log line."""
+        verdicts = self._verdicts
+        entry = verdicts.get(log_entry)
+        if entry is not None:
+            # No lock: a concurrent increment may rarely be lost, which only skews template counts
+            entry[2] += 1
+            return entry[0], entry[1], True
+        is_anomaly, rule_message = _evaluate_rules(log_entry)
+        if len(verdicts) >= self.max_entries:
+            with self._lock:
+                if len(self._verdicts) >= self.max_entries:
+                    self._mine_pending()
+                    self._evicted += len(self._verdicts)
+                    self._verdicts = {}
+            verdicts = self._verdicts
+        verdicts.setdefault(log_entry, [is_anomaly, rule_message, 0])[2] += 1
+        return is_anomaly, rule_message, False
+
+    def _mine_pending(self):
+        """Feeds the lines seen since the last call into the template miner (lock held)."""
+        for log_entry, entry in self._verdicts.items():
+            seen = entry[2]
+            if seen:
+                entry[2] -= seen
+                self._mined_lookups += seen
+                self.miner.add_log_message(log_entry, seen)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            self._mine_pending()
+            lookups = self._mined_lookups
+            hits = lookups - self.misses
+            return {
+                "templates_mined": len(self.miner.clusters),
+                "lookups": lookups,
+                "cache_hits": hits,
+                "cache_misses": self.misses,
+                "cache_hit_rate": (hits / lookups) if lookups > 0 else 0,
+                "template_counts": self.miner.get_template_counts()
+            }
+
+template_verdict_cache = TemplateVerdictCache()
+
+def check_template_cache_consistency(log_lines) -> list:
+    """Runs `log_lines` through a fresh verdict cache and returns the lines where the cached
+    path disagrees with the full rules, as [{"log", "cached_verdict", "rule_verdict"}]."""
+    verdict_cache = TemplateVerdictCache()
+    mismatches = []
+    for line in log_lines:
+        is_anomaly, _, _ = verdict_cache.evaluate(line)
+        expected, _ = _evaluate_rules(line)
+        if is_anomaly != expected:
+            mismatches.append({"log": line, "cached_verdict": is_anomaly, "rule_verdict": expected})
+    return mismatches
+
+# Simple Rule-Based Anomaly Detection Function
+def analyze_log_entry(log_entry: str, use_template_cache: bool = True, verdict_cache: TemplateVerdictCache = None) -> bool:
+    """Simulates behavioral analytics to detect anomalies using rules.
+
+    `verdict_cache` replaces the shared verdict cache (e.g. a fresh one per replay).
+    """
+    print(f"\n--- Analyzing Log Entry ---")
+    print(f"Log: '{log_entry.strip()}'")
+
+    if not use_template_cache:
+        is_anomaly, rule_message = _evaluate_rules(log_entry)
+        print(f"--> Rule: {rule_message}")
+        return is_anomaly
+
+    is_anomaly, rule_message, cached = (verdict_cache or template_verdict_cache).evaluate(log_entry)
+    if cached:
+        print(f"--> Rule (cached): {rule_message}")
+    else:
+        print(f"--> Rule: {rule_message}")
+    return is_anomaly
+
+def get_template_cache_stats() -> dict:
+    """Returns template counts and verdict cache hit rates for the evaluation report."""
+    return template_verdict_cache.get_stats()
+
+def select_response(log_entry: str) -> dict:
+    """Chooses the automated response for an anomalous log entry (no side effects)."""
+    log_entry_lower = log_entry.lower()
+    if "failed login" in log_entry_lower:
+        return {"response_type": "block_ip", "target": "10.0.0.5", "reason": "failed login attempts"}
+    elif "unauthorized file access" in log_entry_lower:
+        return {"response_type": "isolate_host", "target": "scenario_web_server", "reason": "unauthorized access"}
+    else: # Default for other anomalies
+        return {"response_type": "review_alert", "target": "unknown", "reason": "unspecified anomaly"}
 
 def execute_automated_response(anomaly_details: dict) -> dict:
     """Simulates an automated defensive action within the Docker environment."""
@@ -77,6 +193,11 @@ def execute_automated_response(anomaly_details: dict) -> dict:
     print(f"Target: {target}")
     print(f"Reason: {reason}")
 
+    # O(1) check against the Docker events-fed cache instead of a failed round trip
+    if container_state_cache.check_running("scenario_web_server") is False:
+        print("Skipping defense: container 'scenario_web_server' is not running (cached state).")
+        return {"success": False, "output": "Defense target container not running"}
+
     try:
         client = docker.from_env()
         # Find the web server container to simulate actions on it
@@ -104,6 +225,7 @@ def execute_automated_response(anomaly_details: dict) -> dict:
             return {"success": False, "action": "UNSUPPORTED_RESPONSE"}
 
     except docker.errors.NotFound:
+        container_state_cache.record_not_found("scenario_web_server")
         print(f"Error: Docker container 'scenario_web_server' not found. Is it running?")
         return {"success": False, "output": "Defense target container not found"}
     except Exception as e:
@@ -143,4 +265,20 @@ if __name__ == "__main__":
     else:
         print("No anomaly, no response needed.")
 
+    # Scenario 4: Template verdict cache vs. full rules
+    print("\nScenario 4: Template Verdict Cache Consistency")
+    cache_check_logs = [
+        "[HTTP] GET /index.html 200", "[HTTP] GET /index.html 200", "[HTTP] GET /index.html 500",
+        "[DEBUG] Process 123 started", "[DEBUG] Process 456 started", "[DEBUG] Process abc started",
+        "[INFO] User bob logged in successfully from 10.0.0.1", "[INFO] User alice logged in successfully from 10.0.0.2",
+        "[INFO] User exploit logged in successfully from 10.0.0.3", "[INFO] User alice logged in successfully from 10.0.0.4",
+        "[INFO] User bob-evil logged in successfully from 10.0.0.5",
+        "[ALERT] Multiple failed login attempts from 10.0.0.5 for user 'root'!",
+        "[ALERT] Multiple failed login attempts from 10.0.0.6 for user 'root'!",
+    ]
+    mismatches = check_template_cache_consistency(cache_check_logs)
+    print(f"Cached vs. full-rule verdict mismatches: {len(mismatches)}")
+    for mismatch in mismatches:
+        print(f"  {mismatch}")
+
     print("\nDefense Agent's basic anomaly detection and automated response capabilities demonstrated.")
\ No newline at end of file
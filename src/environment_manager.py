@@ -2,45 +2,84 @@
 import time
 import random
 import docker
+from src.container_state import container_state_cache
+from src.adaptation_precompute import adaptation_precomputer
 
-def simulate_env_adjustment(event_type: str, details: dict = None):
+# Adaptations currently in effect, {target container: PreparedAdaptation}
+active_adaptations = {}
+
+def _apply_prepared_adaptation(event_type: str, details: dict, result: dict):
+    """Swaps in the adaptation prepared by the precomputer (or prepared now, on a speculation miss)."""
+    start = time.perf_counter()
+    adaptation, hit = adaptation_precomputer.take(event_type, details)
+    active_adaptations[adaptation.target] = adaptation
+    print(f"Applied {'pre-computed' if hit else 'inline-prepared'} adaptation for {adaptation.target} in "
+          f"{time.perf_counter() - start:.3f}s (preparation took {adaptation.prepare_seconds:.3f}s, "
+          f"content: {', '.join(adaptation.content) or 'none'}, image ready: {adaptation.image_ready}).")
+    result["speculation"] = "hit" if hit else "miss"
+
+def simulate_env_adjustment(event_type: str, details: dict = None) -> dict:
+    """Applies a dynamic environment adjustment and returns {"success", "action", "target"}."""
     print(f"\n--- Dynamic Environment Adjustment Triggered ---")
     print(f"Event: {event_type}")
     if details:
         print(f"Details: {details}")
+    details = details or {}
 
+    # (Assuming target_container might be passed in details for consistency)
+    target_container = details.get("target_container", "unknown_target")
+    result = {"success": True, "action": "NO_ACTION", "target": target_container}
     try:
-        client = docker.from_env() # Initialize Docker client
-        # (Assuming target_container might be passed in details for consistency)
-        target_container = details.get("target_container", "unknown_target")
-
         if event_type == "VULNERABILITY_PATCHED":
             print("Response: Detected a vulnerability was patched. Automatically introducing a new, simulated 'zero-day' threat or escalating attack intensity.")
+            _apply_prepared_adaptation(event_type, details, result)
+            result["action"] = "THREAT_ESCALATED"
         elif event_type == "ATTACK_DETECTED":
             print("Response: Detected an ongoing attack. Taking real action to reduce impact.")
             if target_container == "scenario_web_server": # Only stop web server for now
-                print(f"Action: Attempting to stop {target_container} to contain threat.")
-                container = client.containers.get(target_container)
-                container.stop()
-                print(f"Successfully stopped {target_container}.")
+                if container_state_cache.check_running(target_container) is False:
+                    # Already stopped (or gone) according to the Docker events-fed cache; no round trip needed
+                    print(f"{target_container} is not running (cached state). No stop needed.")
+                    result["action"] = "ALREADY_STOPPED"
+                else:
+                    client = docker.from_env() # Initialize Docker client
+                    container = client.containers.get(target_container)
+                    if container.status != "running":
+                        # Nothing to contain; skip the (slow) stop round trip
+                        print(f"{target_container} is already '{container.status}'. No stop needed.")
+                        result["action"] = "ALREADY_STOPPED"
+                    else:
+                        print(f"Action: Attempting to stop {target_container} to contain threat.")
+                        container.stop()
+                        print(f"Successfully stopped {target_container}.")
+                        result["action"] = "CONTAINER_STOPPED"
             else:
                 print(f"No specific stop action defined for {target_container}. Simulating increased defensive posture.")
+                result["action"] = "POSTURE_INCREASED"
         elif event_type == "DEFENDER_WEAKNESS_IDENTIFIED":
             skill_gap = details.get("skill_gap", "unknown skill")
             print(f"Response: Identified defender weakness in '{skill_gap}'. Adapting scenario to provide more challenges in this area (e.g., adding more complex log files for analysis).")
+            _apply_prepared_adaptation(event_type, details, result)
+            result["action"] = "SCENARIO_ADAPTED"
         elif event_type == "ATTACK_BLOCKED": # ADD THIS NEW ELIF BLOCK
             attacker_ip = details.get("attacker_ip", "unknown IP")
             print(f"Response: Attack from {attacker_ip} was successfully blocked/mitigated. Environment posture maintained or slightly relaxed.")
             # You could add a conceptual action here, like "redeploy honeypot" or "log success to SIEM"
+            result["action"] = "POSTURE_MAINTAINED"
         else:
             print(f"Unrecognized event type: {event_type}. No specific adjustment performed.")
+            result = {"success": False, "action": "UNRECOGNIZED_EVENT", "target": target_container}
 
     except docker.errors.NotFound:
+        container_state_cache.record_not_found(target_container)
         print(f"Error: Docker container '{target_container}' not found for dynamic adjustment.")
+        result = {"success": False, "action": "CONTAINER_NOT_FOUND", "target": target_container}
     except Exception as e:
         print(f"An unexpected error occurred during dynamic adjustment: {e}")
+        result = {"success": False, "action": "ERROR", "target": target_container, "details": str(e)}
 
     print("---------------------------------------------")
+    return result
 
 if __name__ == "__main__":
     print("Environment Manager: Ready to receive dynamic events.")
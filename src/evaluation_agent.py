@@ -1,26 +1,61 @@
 # src/evaluation_agent.py
 import json
+import mmap
 import os
-from datetime import datetime
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
+import orjson
+from src.events import Event, AttackSimulated, make_event, event_from_dict, event_from_json
+from src.blob_store import blob_store_for_log
 
 LOG_FILE_PATH = "logs/cyber_range_events.log" # Path to your simulated log file
 
+# Optional indexed event repository (see src/event_repository.py); events are mirrored there when attached
+_event_repository = None
+_session_id = None
+_log_lock = threading.Lock() # Events may also be logged from worker threads (e.g. the environment action queue)
+
+def attach_event_repository(repository, session_id: str):
+    """Mirrors every logged event into `repository` under `session_id` (None detaches)."""
+    global _event_repository, _session_id
+    _event_repository = repository
+    _session_id = session_id
+
 # --- Simulated Event Logging Function ---
-def log_event(event_type: str, details: dict):
-    """Logs a structured event to a file."""
-    timestamp = datetime.now() # Store as datetime object temporarily
-    log_entry = {
-        "timestamp": timestamp.isoformat(), # Convert to string for JSON
-        "event_type": event_type,
-        "details": details
-    }
-    # Add specific timestamps to details for calculation later
-    if event_type == "ANOMALY_DETECTED" or event_type == "DEFENSE_EXECUTED":
-        log_entry["details"]["event_timestamp"] = timestamp.isoformat()
-    with open(LOG_FILE_PATH, "a") as f:
-        f.write(json.dumps(log_entry) + "\n")
-    print(f"Logged event: {event_type}")
+def log_event(event, details: dict = None, log_path: str = None) -> Event:
+    """Logs a structured event to a file.
+
+    Accepts a typed Event (passed by reference) or the legacy (event_type, details) pair.
+    Serialisation only happens here, at the storage boundary; large attack outputs are
+    spilled to the blob store and the event keeps a BlobRef in their place.
+    `log_path` overrides LOG_FILE_PATH (e.g. for load tests).
+    """
+    if not isinstance(event, Event):
+        event = make_event(event, details)
+    if isinstance(event, AttackSimulated):
+        event.spill_output(blob_store_for_log(log_path or LOG_FILE_PATH)) # Kept next to the log it belongs to
+    line = event.to_json()
+    with _log_lock:
+        with open(log_path or LOG_FILE_PATH, "a") as f:
+            f.write(line + "\n")
+        if _event_repository is not None:
+            _event_repository.add(event, _session_id, payload=line)
+    print(f"Logged event: {event.event_type}")
+    return event
+
+def iter_log_events(log_path: str):
+    """Yields typed events parsed from a JSON-lines event log, skipping unparsable lines.
+
+    Spilled attack outputs are loaded from the blob store next to the log, wherever it was copied to.
+    """
+    blob_store = blob_store_for_log(log_path)
+    with open(log_path, "r") as f:
+        for line in f:
+            try:
+                yield event_from_json(line, blob_store)
+            except (json.JSONDecodeError, ValueError, TypeError) as e:
+                print(f"Warning: Could not parse log line: {line.strip()} - {e}")
 
 # src/evaluation_agent.py (Updated generate_evaluation_report)
 
@@ -33,124 +68,306 @@ SKILL_MAPPING = {
     "Incident Response": ["DEFENSE_EXECUTED"] # General response
 }
 
-def generate_evaluation_report(log_path: str) -> dict:
-    """Generates a comprehensive evaluation report from event logs."""
-    print(f"\n--- Generating Evaluation Report from: {log_path} ---")
-    successful_attacks = 0
-    failed_attacks = 0
-    anomalies_detected = 0
-    defenses_triggered = 0
-
-    # For time-based metrics
-    attack_timestamps = {} # {attack_id: timestamp}
-    anomaly_timestamps = {} # {anomaly_id: timestamp}
-    defense_timestamps = {} # {anomaly_id: timestamp of defense}
-    time_to_detect_sum_seconds = 0
-    time_to_remediate_sum_seconds = 0
-    detected_attacks_count = 0
-    remediated_attacks_count = 0
-
-    # For skill profiling
-    skill_activity = {skill: {"demonstrated": 0, "total_attempts": 0} for skill in SKILL_MAPPING.keys()}
+def generate_evaluation_report(log_path: str = None, repository=None, session_id: str = None,
+                               parallel: bool = False, workers: int = None) -> dict:
+    """Generates a comprehensive evaluation report from event logs.
 
+    With `repository`, the report is computed from the indexed event store instead of the
+    raw log (for one session, or for every stored event when `session_id` is None).
+    With `parallel`, the log file is memory-mapped and parsed in chunks by `workers`
+    processes (default: one per core), whose partial reports are merged.
+    """
+    if repository is not None:
+        print(f"\n--- Generating Evaluation Report from event repository (session: {session_id or 'all'}) ---")
+        repository.flush()
+        if session_id is not None:
+            return build_report(repository.iter_events(session_id=session_id))
+        # One accumulator per session: a session's last attack must not be paired with the next session's events
+        accumulator = ReportAccumulator()
+        for session in repository.list_sessions():
+            session_accumulator = ReportAccumulator()
+            for event in repository.iter_events(session_id=session["session_id"]):
+                session_accumulator.add(event)
+            accumulator.merge(session_accumulator.close())
+        return accumulator.report()
+    print(f"\n--- Generating Evaluation Report from: {log_path} ---")
     if not os.path.exists(log_path):
         print(f"Error: Log file not found at {log_path}. Cannot generate report.")
         return {}
+    if parallel:
+        return build_report_parallel(log_path, workers=workers)
+    return build_report(iter_log_events(log_path))
 
-    with open(log_path, "r") as f:
-        for line in f:
-            try:
-                event = json.loads(line)
-                event_type = event.get("event_type")
-                details = event.get("details", {})
-                event_timestamp_str = details.get("event_timestamp") or event.get("timestamp") # Use details timestamp if present
-                event_dt = datetime.fromisoformat(event_timestamp_str) if event_timestamp_str else None
-
-                if event_type == "ATTACK_SIMULATED":
-                    successful_attacks += 1 if details.get("success") else 0
-                    failed_attacks += 1 if not details.get("success") else 0
-                    # Assign unique ID to track attack for detection time calculation
-                    attack_id = f"attack_{successful_attacks + failed_attacks}"
-                    attack_timestamps[attack_id] = event_dt
-                    # Update skill
-                    skill_activity["Vulnerability Exploitation"]["total_attempts"] += 1
-                    if details.get("success"):
-                        skill_activity["Vulnerability Exploitation"]["demonstrated"] += 1
-
-                elif event_type == "ANOMALY_DETECTED":
-                    anomalies_detected += 1
-                    # Assign unique ID to link anomaly to potential attack for detection time
-                    # For simplicity, let's link to the *last* attack simulated
-                    last_attack_id = f"attack_{successful_attacks + failed_attacks}" # This is simplistic, would need real correlation
-                    anomaly_timestamps[last_attack_id] = event_dt # Store time of anomaly detection
-                    detected_attacks_count += 1
-                    # Update skills
-                    skill_activity["Log Analysis"]["demonstrated"] += 1
-                    skill_activity["Log Analysis"]["total_attempts"] += 1
-                    skill_activity["Intrusion Detection"]["demonstrated"] += 1
-                    skill_activity["Intrusion Detection"]["total_attempts"] += 1
-
-
-                elif event_type == "DEFENSE_EXECUTED":
-                    defenses_triggered += 1
-                    # Link defense to the anomaly it's responding to
-                    last_attack_id = f"attack_{successful_attacks + failed_attacks}" # Simplistic correlation
-                    defense_timestamps[last_attack_id] = event_dt # Store time of defense execution
-                    remediated_attacks_count += 1
-                    # Update skill for Incident Response
-                    skill_activity["Incident Response"]["demonstrated"] += 1
-                    skill_activity["Incident Response"]["total_attempts"] += 1
-                    # Update Network Defense if relevant action was successful
-                    if details.get("action_details", {}).get("success"):
-                        if "block_ip" in details.get("action_details", {}).get("action", "").lower() or \
-                           "isolate_host" in details.get("action_details", {}).get("action", "").lower():
-                            skill_activity["Network Defense"]["demonstrated"] += 1
-                    skill_activity["Network Defense"]["total_attempts"] += 1
-
-
-            except json.JSONDecodeError as e:
-                print(f"Warning: Could not parse log line: {line.strip()} - {e}")
-            except Exception as e:
-                print(f"Warning: Error processing event: {event.get('event_type')} - {e}")
-
-    # Calculate time-based metrics
-    for attack_id, attack_dt in attack_timestamps.items():
-        if attack_id in anomaly_timestamps:
-            time_to_detect_sum_seconds += (anomaly_timestamps[attack_id] - attack_dt).total_seconds()
-        if attack_id in defense_timestamps:
-            # If defense happened after anomaly, calc remediation time from anomaly detection
-            if attack_id in anomaly_timestamps and defense_timestamps[attack_id] > anomaly_timestamps[attack_id]:
-                time_to_remediate_sum_seconds += (defense_timestamps[attack_id] - anomaly_timestamps[attack_id]).total_seconds()
-            # If defense happened without an explicit anomaly_detected (direct response)
+def _segment_times(attack_ts: float, anomaly_ts: float, defense_ts: float) -> tuple:
+    """(time to detect, time to remediate) contributed by one attack and the last anomaly/defense after it."""
+    time_to_detect = (anomaly_ts - attack_ts) if anomaly_ts is not None else 0
+    time_to_remediate = 0
+    if defense_ts is not None:
+        # If defense happened after anomaly, calc remediation time from anomaly detection
+        if anomaly_ts is not None and defense_ts > anomaly_ts:
+            time_to_remediate = defense_ts - anomaly_ts
+        # If defense happened without an explicit anomaly_detected (direct response)
+        else:
+            time_to_remediate = defense_ts - attack_ts # Remediate from attack start
+    return time_to_detect, time_to_remediate
+
+class ReportAccumulator:
+    """Partial evaluation report over a contiguous run of events.
+
+    Anomalies and defenses are correlated with the *last* attack simulated before them
+    (the last one per attack wins). Those seen before the run's first attack (head) and the
+    run's last attack (tail) stay open until the next run is merged, so accumulators of
+    consecutive runs merge associatively: a.merge(b) is the accumulator of a's events then b's.
+    """
+
+    def __init__(self):
+        self.successful_attacks = 0
+        self.failed_attacks = 0
+        self.anomalies_detected = 0
+        self.defenses_triggered = 0
+        self.skill_activity = {skill: {"demonstrated": 0, "total_attempts": 0} for skill in SKILL_MAPPING.keys()}
+        # Time-based metrics of attacks already followed by another attack
+        self.time_to_detect_sum_seconds = 0
+        self.time_to_remediate_sum_seconds = 0
+        self.has_attack = False
+        self.head_anomaly_ts = None # Belong to an attack in an earlier run
+        self.head_defense_ts = None
+        self.tail_attack_ts = None
+        self.tail_anomaly_ts = None
+        self.tail_defense_ts = None
+        # LLM latency (time-to-first-token per LLM_CALL event)
+        self.llm_ttfts = []
+        # Log template mining / verdict cache statistics (latest LOG_TEMPLATE_STATS event wins)
+        self.log_template_stats = None
+
+    def _close_tail(self, anomaly_ts: float, defense_ts: float):
+        time_to_detect, time_to_remediate = _segment_times(self.tail_attack_ts, anomaly_ts, defense_ts)
+        self.time_to_detect_sum_seconds += time_to_detect
+        self.time_to_remediate_sum_seconds += time_to_remediate
+
+    def add(self, event):
+        try:
+            event_type = event.event_type
+            event_ts = event.timing_ts # Numeric timestamp (seconds), details["event_timestamp"] if present
+            if event_ts is None:
+                raise ValueError("event has no timestamp")
+
+            if event_type == "ATTACK_SIMULATED":
+                attack_success = event.get("success")
+                self.successful_attacks += 1 if attack_success else 0
+                self.failed_attacks += 1 if not attack_success else 0
+                # A new attack closes the previous one's detection/remediation window
+                if self.has_attack:
+                    self._close_tail(self.tail_anomaly_ts, self.tail_defense_ts)
+                self.has_attack = True
+                self.tail_attack_ts, self.tail_anomaly_ts, self.tail_defense_ts = event_ts, None, None
+                # Update skill
+                self.skill_activity["Vulnerability Exploitation"]["total_attempts"] += 1
+                if attack_success:
+                    self.skill_activity["Vulnerability Exploitation"]["demonstrated"] += 1
+
+            elif event_type == "ANOMALY_DETECTED":
+                self.anomalies_detected += 1
+                # Link to the *last* attack simulated (simplistic, would need real correlation)
+                if self.has_attack:
+                    self.tail_anomaly_ts = event_ts
+                else:
+                    self.head_anomaly_ts = event_ts
+                # Update skills
+                self.skill_activity["Log Analysis"]["demonstrated"] += 1
+                self.skill_activity["Log Analysis"]["total_attempts"] += 1
+                self.skill_activity["Intrusion Detection"]["demonstrated"] += 1
+                self.skill_activity["Intrusion Detection"]["total_attempts"] += 1
+
+            elif event_type == "DEFENSE_EXECUTED":
+                self.defenses_triggered += 1
+                # Link defense to the last attack as well (simplistic correlation)
+                if self.has_attack:
+                    self.tail_defense_ts = event_ts
+                else:
+                    self.head_defense_ts = event_ts
+                # Update skill for Incident Response
+                self.skill_activity["Incident Response"]["demonstrated"] += 1
+                self.skill_activity["Incident Response"]["total_attempts"] += 1
+                # Update Network Defense if relevant action was successful
+                action_details = event.get("action_details") or {}
+                if action_details.get("success"):
+                    if "block_ip" in action_details.get("action", "").lower() or \
+                       "isolate_host" in action_details.get("action", "").lower():
+                        self.skill_activity["Network Defense"]["demonstrated"] += 1
+                self.skill_activity["Network Defense"]["total_attempts"] += 1
+
+            elif event_type == "LLM_CALL":
+                if event.get("ttft_seconds") is not None:
+                    self.llm_ttfts.append(event.get("ttft_seconds"))
+
+            elif event_type == "LOG_TEMPLATE_STATS":
+                self.log_template_stats = event.details
+
+        except Exception as e:
+            print(f"Warning: Error processing event: {event.event_type} - {e}")
+
+    def close(self) -> "ReportAccumulator":
+        """Ends the run (e.g. a session): the last attack's window closes here instead of staying
+        open for the next merged run, and anomalies/defenses before the first attack stay unpaired."""
+        if self.has_attack:
+            self._close_tail(self.tail_anomaly_ts, self.tail_defense_ts)
+        self.has_attack = False
+        self.head_anomaly_ts = self.head_defense_ts = None
+        self.tail_attack_ts = self.tail_anomaly_ts = self.tail_defense_ts = None
+        return self
+
+    def merge(self, other: "ReportAccumulator") -> "ReportAccumulator":
+        """Folds in the accumulator of the events directly following this one's (in place)."""
+        self.successful_attacks += other.successful_attacks
+        self.failed_attacks += other.failed_attacks
+        self.anomalies_detected += other.anomalies_detected
+        self.defenses_triggered += other.defenses_triggered
+        for skill, data in other.skill_activity.items():
+            self.skill_activity[skill]["demonstrated"] += data["demonstrated"]
+            self.skill_activity[skill]["total_attempts"] += data["total_attempts"]
+
+        # The other run's head continues our tail (or, without any attack yet, our head)
+        if self.has_attack:
+            anomaly_ts = other.head_anomaly_ts if other.head_anomaly_ts is not None else self.tail_anomaly_ts
+            defense_ts = other.head_defense_ts if other.head_defense_ts is not None else self.tail_defense_ts
+            if other.has_attack:
+                self._close_tail(anomaly_ts, defense_ts)
             else:
-                 time_to_remediate_sum_seconds += (defense_timestamps[attack_id] - attack_dt).total_seconds() # Remediate from attack start
+                self.tail_anomaly_ts, self.tail_defense_ts = anomaly_ts, defense_ts
+        else:
+            if other.head_anomaly_ts is not None:
+                self.head_anomaly_ts = other.head_anomaly_ts
+            if other.head_defense_ts is not None:
+                self.head_defense_ts = other.head_defense_ts
+        self.time_to_detect_sum_seconds += other.time_to_detect_sum_seconds
+        self.time_to_remediate_sum_seconds += other.time_to_remediate_sum_seconds
+        if other.has_attack:
+            self.has_attack = True
+            self.tail_attack_ts, self.tail_anomaly_ts, self.tail_defense_ts = \
+                other.tail_attack_ts, other.tail_anomaly_ts, other.tail_defense_ts
+
+        self.llm_ttfts.extend(other.llm_ttfts)
+        if other.log_template_stats is not None:
+            self.log_template_stats = other.log_template_stats
+        return self
+
+    def report(self) -> dict:
+        time_to_detect_sum_seconds = self.time_to_detect_sum_seconds
+        time_to_remediate_sum_seconds = self.time_to_remediate_sum_seconds
+        if self.has_attack: # The last attack's window closes at the end of the log
+            time_to_detect, time_to_remediate = _segment_times(self.tail_attack_ts, self.tail_anomaly_ts, self.tail_defense_ts)
+            time_to_detect_sum_seconds += time_to_detect
+            time_to_remediate_sum_seconds += time_to_remediate
 
-    avg_time_to_detect = (time_to_detect_sum_seconds / detected_attacks_count) if detected_attacks_count > 0 else 0
-    avg_time_to_remediate = (time_to_remediate_sum_seconds / remediated_attacks_count) if remediated_attacks_count > 0 else 0
+        # Every anomaly counts as a detection and every defense as a remediation
+        avg_time_to_detect = (time_to_detect_sum_seconds / self.anomalies_detected) if self.anomalies_detected > 0 else 0
+        avg_time_to_remediate = (time_to_remediate_sum_seconds / self.defenses_triggered) if self.defenses_triggered > 0 else 0
 
+        # Final skill percentages
+        skill_profiles = {}
+        for skill, data in self.skill_activity.items():
+            skill_profiles[skill] = {
+                "demonstrated_count": data["demonstrated"],
+                "total_attempts": data["total_attempts"],
+                "percentage": (data["demonstrated"] / data["total_attempts"]) * 100 if data["total_attempts"] > 0 else 0
+            }
 
-    # Final skill percentages
-    skill_profiles = {}
-    for skill, data in skill_activity.items():
-        skill_profiles[skill] = {
-            "demonstrated_count": data["demonstrated"],
-            "total_attempts": data["total_attempts"],
-            "percentage": (data["demonstrated"] / data["total_attempts"]) * 100 if data["total_attempts"] > 0 else 0
+        llm_ttfts = self.llm_ttfts
+        report = {
+            "summary": {
+                "total_attacks_attempted": self.successful_attacks + self.failed_attacks,
+                "successful_attacks": self.successful_attacks,
+                "failed_attacks": self.failed_attacks,
+                "anomalies_detected": self.anomalies_detected,
+                "defenses_triggered": self.defenses_triggered,
+                "avg_time_to_detect_seconds": f"{avg_time_to_detect:.2f}",
+                "avg_time_to_remediate_seconds": f"{avg_time_to_remediate:.2f}"
+            },
+            "skill_profiles": skill_profiles,
+            "llm_calls": {
+                "calls": len(llm_ttfts),
+                "first_call_ttft_seconds": llm_ttfts[0] if llm_ttfts else 0,
+                "avg_ttft_seconds": (sum(llm_ttfts) / len(llm_ttfts)) if llm_ttfts else 0
+            },
+            "log_templates": self.log_template_stats or {}
         }
+        return report
+
+def build_report(events) -> dict:
+    """Computes the evaluation report from an iterable of typed events (in log order)."""
+    accumulator = ReportAccumulator()
+    for event in events:
+        accumulator.add(event)
+    return accumulator.report()
+
+# --- Parallel, memory-mapped log parsing ---
+PARALLEL_MIN_CHUNK_BYTES = 1024 * 1024 # Smaller logs are not worth a process pool
+CHUNKS_PER_WORKER = 4 # Several chunks per worker, so uneven chunks still keep every core busy
+
+def _split_log_chunks(log_path: str, chunk_count: int) -> list:
+    """Splits the file into about `chunk_count` (start, end) byte ranges, each ending at a newline."""
+    size = os.path.getsize(log_path)
+    if size == 0:
+        return []
+    target = -(-size // chunk_count)
+    chunks = []
+    with open(log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            newline = mm.find(b"\n", start + target - 1) if start + target < size else -1
+            end = size if newline == -1 else newline + 1
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+def _aggregate_log_chunk(log_path: str, start: int, end: int) -> ReportAccumulator:
+    """Worker: parses one byte range of the log with orjson and returns its partial report."""
+    accumulator = ReportAccumulator()
+    blob_store = blob_store_for_log(log_path)
+    with open(log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for line in mm[start:end].splitlines():
+            try:
+                event = event_from_dict(orjson.loads(line), blob_store)
+            except (orjson.JSONDecodeError, ValueError, TypeError) as e:
+                print(f"Warning: Could not parse log line: {line.decode(errors='replace').strip()} - {e}")
+                continue
+            accumulator.add(event)
+    return accumulator
+
+def build_report_parallel(log_path: str, workers: int = None) -> dict:
+    """Like build_report(iter_log_events(log_path)), with the log split across worker processes."""
+    workers = workers or os.cpu_count() or 1
+    chunk_count = max(1, min(workers * CHUNKS_PER_WORKER, os.path.getsize(log_path) // PARALLEL_MIN_CHUNK_BYTES))
+    chunks = _split_log_chunks(log_path, chunk_count)
+    accumulator = ReportAccumulator()
+    if len(chunks) <= 1 or workers == 1:
+        for start, end in chunks:
+            accumulator.merge(_aggregate_log_chunk(log_path, start, end))
+        return accumulator.report()
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+        # map() yields in chunk order; merging is associative but not commutative
+        for partial in executor.map(_aggregate_log_chunk, [log_path] * len(chunks),
+                                    [start for start, _ in chunks], [end for _, end in chunks]):
+            accumulator.merge(partial)
+    return accumulator.report()
 
-    report = {
-        "summary": {
-            "total_attacks_attempted": successful_attacks + failed_attacks,
-            "successful_attacks": successful_attacks,
-            "failed_attacks": failed_attacks,
-            "anomalies_detected": anomalies_detected,
-            "defenses_triggered": defenses_triggered,
-            "avg_time_to_detect_seconds": f"{avg_time_to_detect:.2f}",
-            "avg_time_to_remediate_seconds": f"{avg_time_to_remediate:.2f}"
+def generate_cross_session_report(repository, team: str = None, scenario: str = None) -> dict:
+    """Per-session reports plus cross-session trends, computed from the event repository."""
+    print(f"\n--- Generating Cross-Session Report (team: {team or 'all'}, scenario: {scenario or 'all'}) ---")
+    repository.flush()
+    sessions = []
+    for session in repository.list_sessions(team=team, scenario=scenario):
+        report = build_report(repository.iter_events(session_id=session["session_id"]))
+        sessions.append({**session, "summary": report["summary"], "skill_profiles": report["skill_profiles"]})
+    return {
+        "sessions": sessions,
+        "trends": {
+            "avg_time_to_detect_seconds": [float(s["summary"]["avg_time_to_detect_seconds"]) for s in sessions],
+            "avg_time_to_remediate_seconds": [float(s["summary"]["avg_time_to_remediate_seconds"]) for s in sessions],
         },
-        "skill_profiles": skill_profiles
+        "attack_outcomes_by_type": repository.attack_outcomes_by_type(team=team, scenario=scenario)
     }
-    return report
 
 if __name__ == "__main__":
     # --- Simulate an Exercise Session for logging ---
@@ -0,0 +1,181 @@
+# src/event_repository.py
+import threading
+import time
+import uuid
+from sqlalchemy import (create_engine, MetaData, Table, Column, Integer, String, Float, Boolean, Text, Index,
+                        select, insert, func, case)
+from src.events import Event, AttackSimulated, AttackDecision, DefenseExecuted, event_from_json
+
+# --- Indexed Event Repository (optional) ---
+# Events are written in batched transactions next to the JSON-lines log, so per-session and
+# cross-session reports can be computed with indexed queries instead of re-parsing raw logs.
+EVENT_DB_URL = "sqlite:///logs/cyber_range_events.db"
+
+metadata = MetaData()
+
+sessions_table = Table(
+    "sessions", metadata,
+    Column("session_id", String(32), primary_key=True),
+    Column("team", String(128), index=True),
+    Column("scenario", String(256)),
+    Column("started_at", Float, nullable=False),
+)
+
+events_table = Table(
+    "events", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("session_id", String(32), nullable=False),
+    Column("seq", Integer, nullable=False), # Order of the event within its session
+    Column("event_type", String(64), nullable=False),
+    Column("target", String(256)),
+    Column("action", Text), # Attack type / decision / defense action, when the event has one
+    Column("success", Boolean),
+    Column("ts", Float, nullable=False),
+    Column("payload", Text, nullable=False), # The event's JSON line, as written to the log
+    Index("ix_events_session_seq", "session_id", "seq"),
+    Index("ix_events_session_type_ts", "session_id", "event_type", "ts"),
+    Index("ix_events_type_target_ts", "event_type", "target", "ts"),
+)
+
+
+def _index_columns(event: Event) -> tuple:
+    """Returns the (target, action, success) columns indexed for an event."""
+    if isinstance(event, AttackSimulated):
+        return event.get("target"), event.get("attack_type"), event.get("success")
+    if isinstance(event, AttackDecision):
+        return event.get("target"), event.get("decision"), None
+    if isinstance(event, DefenseExecuted):
+        action_details = event.get("action_details") or {}
+        return action_details.get("target"), action_details.get("action"), action_details.get("success")
+    return event.get("target"), None, None
+
+
+class EventRepository:
+    def __init__(self, db_url: str = EVENT_DB_URL, batch_size: int = 100, blob_store=None):
+        """`blob_store` is where spilled attack outputs of the stored events live (default: the default store)."""
+        self.engine = create_engine(db_url)
+        self.blob_store = blob_store
+        metadata.create_all(self.engine)
+        self.batch_size = batch_size
+        self._pending = []
+        self._next_seq = {} # {session_id: next seq}
+        self._lock = threading.Lock()
+
+    # --- Writing ---
+    def start_session(self, team: str = None, scenario: str = None, session_id: str = None) -> str:
+        session_id = session_id or uuid.uuid4().hex
+        with self.engine.begin() as conn:
+            conn.execute(insert(sessions_table).values(session_id=session_id, team=team, scenario=scenario,
+                                                       started_at=time.time()))
+        self._next_seq[session_id] = 0
+        return session_id
+
+    def add(self, event: Event, session_id: str, payload: str = None):
+        """Buffers an event; a full batch is written in a single transaction."""
+        target, action, success = _index_columns(event)
+        with self._lock:
+            seq = self._next_seq.get(session_id)
+            if seq is None:
+                seq = self._max_seq(session_id) + 1
+            self._next_seq[session_id] = seq + 1
+            self._pending.append({
+                "session_id": session_id, "seq": seq, "event_type": event.event_type,
+                "target": target, "action": action, "success": success if isinstance(success, bool) else None,
+                "ts": event.ts, "payload": payload or event.to_json()
+            })
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        with self.engine.begin() as conn:
+            conn.execute(insert(events_table), rows)
+
+    def _max_seq(self, session_id: str) -> int:
+        with self.engine.connect() as conn:
+            value = conn.execute(select(func.max(events_table.c.seq)).where(events_table.c.session_id == session_id)).scalar()
+        return -1 if value is None else value
+
+    def close(self):
+        self.flush()
+        self.engine.dispose()
+
+    # --- Query API ---
+    def list_sessions(self, team: str = None, scenario: str = None) -> list:
+        """Returns sessions as dicts, oldest first."""
+        query = select(sessions_table).order_by(sessions_table.c.started_at)
+        if team is not None:
+            query = query.where(sessions_table.c.team == team)
+        if scenario is not None:
+            query = query.where(sessions_table.c.scenario == scenario)
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(query)]
+
+    def iter_events(self, session_id: str = None, event_types: list = None, target: str = None,
+                    since: float = None, until: float = None):
+        """Yields typed events matching the filters, in log order (sessions in the order they started)."""
+        query = (select(events_table.c.payload)
+                 .select_from(events_table.join(sessions_table, events_table.c.session_id == sessions_table.c.session_id))
+                 .order_by(sessions_table.c.started_at, events_table.c.session_id, events_table.c.seq))
+        if session_id is not None:
+            query = query.where(events_table.c.session_id == session_id)
+        if event_types:
+            query = query.where(events_table.c.event_type.in_(event_types))
+        if target is not None:
+            query = query.where(events_table.c.target == target)
+        if since is not None:
+            query = query.where(events_table.c.ts >= since)
+        if until is not None:
+            query = query.where(events_table.c.ts < until)
+        with self.engine.connect() as conn:
+            for (payload,) in conn.execute(query):
+                yield event_from_json(payload, self.blob_store)
+
+    def count_events(self, session_id: str = None) -> dict:
+        """Returns {event_type: count} for one session or across all sessions."""
+        query = select(events_table.c.event_type, func.count()).group_by(events_table.c.event_type)
+        if session_id is not None:
+            query = query.where(events_table.c.session_id == session_id)
+        with self.engine.connect() as conn:
+            return {event_type: count for event_type, count in conn.execute(query)}
+
+    def attack_outcomes_by_type(self, target: str = None, team: str = None, scenario: str = None) -> list:
+        """Returns [{"target", "attack_type", "attempts", "failures"}], most failures first.
+
+        `team` / `scenario` restrict the counts to sessions of that team / scenario.
+        """
+        failures = func.sum(case((events_table.c.success.is_(False), 1), else_=0))
+        query = (select(events_table.c.target, events_table.c.action, func.count(), failures)
+                 .select_from(events_table.join(sessions_table, events_table.c.session_id == sessions_table.c.session_id))
+                 .where(events_table.c.event_type == "ATTACK_SIMULATED")
+                 .group_by(events_table.c.target, events_table.c.action)
+                 .order_by(failures.desc()))
+        if target is not None:
+            query = query.where(events_table.c.target == target)
+        if team is not None:
+            query = query.where(sessions_table.c.team == team)
+        if scenario is not None:
+            query = query.where(sessions_table.c.scenario == scenario)
+        with self.engine.connect() as conn:
+            return [{"target": row_target, "attack_type": action, "attempts": attempts, "failures": failed or 0}
+                    for row_target, action, attempts, failed in conn.execute(query)]
+
+
+if __name__ == "__main__":
+    from src.events import AnomalyDetected
+    print("--- Indexed Event Repository ---")
+    repository = EventRepository("sqlite:///:memory:", batch_size=2)
+    session_id = repository.start_session(team="blue_team_demo", scenario="Phishing Campaign - Financial Fraud")
+    repository.add(AttackSimulated(attack_type="sql injection", target="scenario_db_server", success=False, output="connection refused"), session_id)
+    repository.add(AttackSimulated(attack_type="directory traversal", target="scenario_web_server", success=True, output="found /etc/passwd"), session_id)
+    repository.add(AnomalyDetected(log_entry="[ALERT] Multiple failed login attempts from 10.0.0.5 for user 'root'!"), session_id)
+    repository.flush()
+    print(f"Sessions: {repository.list_sessions()}")
+    print(f"Event counts: {repository.count_events(session_id)}")
+    print(f"Attack outcomes on scenario_db_server: {repository.attack_outcomes_by_type('scenario_db_server')}")
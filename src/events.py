@@ -0,0 +1,255 @@
+# src/events.py
+import json
+import time
+from datetime import datetime
+from src.blob_store import BlobRef
+
+# --- Typed Event Model ---
+# Events are built once by the agents, passed by reference to the logger and evaluator,
+# and only turned into the JSON-lines schema at the storage boundary:
+#   {"timestamp": ISO-8601, "event_type": "...", "details": {...}}
+
+# Monotonic clock anchored to wall-clock time at import, so timestamps never go
+# backwards within a run but can still be serialised as ISO strings.
+_WALL_ANCHOR = time.time()
+_MONOTONIC_ANCHOR = time.monotonic()
+
+
+def now() -> float:
+    """Returns a monotonic timestamp in seconds on the Unix epoch scale."""
+    return _WALL_ANCHOR + (time.monotonic() - _MONOTONIC_ANCHOR)
+
+
+def to_isoformat(ts: float) -> str:
+    return datetime.fromtimestamp(ts).isoformat()
+
+
+def from_isoformat(timestamp_str: str) -> float:
+    return datetime.fromisoformat(timestamp_str).timestamp()
+
+
+class _Missing:
+    """Marks a declared detail field that was not provided (omitted when serialised)."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+class Event:
+    """Base class for all cyber range events.
+
+    Subclasses declare `event_type` and the detail `fields` they carry as slots. Detail
+    keys that are not declared are kept in `extra` so arbitrary payloads still round-trip.
+    """
+    __slots__ = ("ts", "extra")
+    event_type = None
+    fields = ()
+
+    def __init__(self, ts: float = None, **details):
+        self.ts = now() if ts is None else ts
+        for name in self.fields:
+            setattr(self, name, details.pop(name, MISSING))
+        self.extra = details or None
+
+    @classmethod
+    def from_details(cls, details: dict, ts: float = None):
+        """Builds an event from a details dict without mutating it."""
+        event = cls.__new__(cls)
+        event.ts = now() if ts is None else ts
+        matched = 0
+        for name in cls.fields:
+            value = details.get(name, MISSING)
+            if value is not MISSING:
+                matched += 1
+            setattr(event, name, value)
+        event.extra = {k: v for k, v in details.items() if k not in cls.fields} if len(details) > matched else None
+        return event
+
+    def get(self, name: str, default=None):
+        """dict.get-style access over declared fields and extra details."""
+        value = getattr(self, name, MISSING) if name in self.fields else MISSING
+        if value is MISSING:
+            return self.extra.get(name, default) if self.extra else default
+        return value
+
+    @property
+    def details(self) -> dict:
+        details = {}
+        for name in self.fields:
+            value = getattr(self, name)
+            if value is not MISSING:
+                details[name] = value
+        if self.extra:
+            details.update(self.extra)
+        return details
+
+    @property
+    def timing_ts(self) -> float:
+        """Timestamp used for detection/remediation timing (the recorded `timestamp` by default)."""
+        return self.ts
+
+    def to_dict(self) -> dict:
+        record = {"timestamp": to_isoformat(self.ts)} if self.ts is not None else {} # Parsed lines may lack one
+        record["event_type"] = self.event_type
+        record["details"] = self.details
+        return record
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    def __repr__(self):
+        return f"{type(self).__name__}(ts={self.ts!r}, details={self.details!r})"
+
+
+class GenericEvent(Event):
+    """Any event type without a dedicated class; details are carried as-is."""
+    __slots__ = ("event_type",)
+
+    def __init__(self, event_type: str, details: dict = None, ts: float = None):
+        self.event_type = event_type
+        self.ts = now() if ts is None else ts
+        self.extra = details
+
+
+class ScenarioGenerated(Event):
+    __slots__ = ("topic", "email_link", "website_url")
+    event_type = "SCENARIO_GENERATED"
+    fields = __slots__
+
+
+class AttackDecision(Event):
+    __slots__ = ("decision", "target")
+    event_type = "ATTACK_DECISION"
+    fields = __slots__
+
+
+class AttackSimulated(Event):
+    """`output` is either the raw text or a BlobRef, serialised as details["output_blob"]."""
+    __slots__ = ("attack_type", "target", "success", "output", "agent_deployed")
+    event_type = "ATTACK_SIMULATED"
+    fields = __slots__
+
+    @classmethod
+    def from_details(cls, details: dict, ts: float = None):
+        if "output_blob" in details:
+            details = dict(details)
+            details["output"] = BlobRef.from_dict(details.pop("output_blob"))
+        return super().from_details(details, ts)
+
+    @property
+    def details(self) -> dict:
+        details = Event.details.fget(self)
+        if isinstance(self.output, BlobRef):
+            # Keep the key in the position "output" would have had
+            details = {("output_blob" if k == "output" else k): (v.to_dict() if k == "output" else v) for k, v in details.items()}
+        return details
+
+    def spill_output(self, blob_store):
+        """Moves a large output to `blob_store`, keeping only its hash, size and preview."""
+        self.output = blob_store.spill(self.output)
+
+    def load_output(self) -> str:
+        """Returns the full output text, reading it from the blob store only if it was spilled."""
+        return self.output.load() if isinstance(self.output, BlobRef) else self.output
+
+
+class RawLogEntry(Event):
+    __slots__ = ("log",)
+    event_type = "RAW_LOG_ENTRY"
+    fields = __slots__
+
+
+class StampedEvent(Event):
+    """Events that also carry details["event_timestamp"], used for detection/remediation timing.
+
+    `event_ts` is kept apart from the recorded `ts` so lines where the two differ round-trip
+    unchanged; it is None for lines from older logs without that key.
+    """
+    __slots__ = ("event_ts",)
+
+    def __init__(self, ts: float = None, event_ts: float = None, **details):
+        super().__init__(ts, **details)
+        self.event_ts = self.ts if event_ts is None else event_ts
+
+    @classmethod
+    def from_details(cls, details: dict, ts: float = None):
+        event = super().from_details(details, ts)
+        event.event_ts = event.ts
+        return event
+
+    @property
+    def timing_ts(self) -> float:
+        return self.ts if self.event_ts is None else self.event_ts
+
+    def to_dict(self) -> dict:
+        record = super().to_dict()
+        if self.event_ts is not None:
+            record["details"]["event_timestamp"] = to_isoformat(self.event_ts)
+        return record
+
+
+class AnomalyDetected(StampedEvent):
+    __slots__ = ("log_entry",)
+    event_type = "ANOMALY_DETECTED"
+    fields = __slots__
+
+
+class DefenseExecuted(StampedEvent):
+    __slots__ = ("action_details",)
+    event_type = "DEFENSE_EXECUTED"
+    fields = __slots__
+
+
+EVENT_TYPES = {cls.event_type: cls for cls in (
+    ScenarioGenerated, AttackDecision, AttackSimulated, RawLogEntry, AnomalyDetected, DefenseExecuted
+)}
+
+
+def make_event(event_type: str, details: dict = None, ts: float = None) -> Event:
+    """Builds the typed event for `event_type` (or a GenericEvent) from a details dict."""
+    cls = EVENT_TYPES.get(event_type)
+    if cls is None:
+        return GenericEvent(event_type, dict(details) if details else {}, ts)
+    return cls.from_details(details or {}, ts)
+
+
+def event_from_dict(raw: dict, blob_store=None) -> Event:
+    """Inverse of Event.to_dict(); takes ownership of (and may modify) `raw`.
+
+    `blob_store` is where spilled attack outputs are loaded from (default: the default store).
+    """
+    event_type = raw.get("event_type")
+    details = raw.get("details") or {}
+    cls = EVENT_TYPES.get(event_type)
+    timestamp_str = raw.get("timestamp")
+    ts = from_isoformat(timestamp_str) if timestamp_str else None
+    if cls is None:
+        event = GenericEvent(event_type, details)
+    elif issubclass(cls, StampedEvent):
+        event_timestamp_str = details.pop("event_timestamp", None)
+        event = cls.from_details(details)
+        event.event_ts = from_isoformat(event_timestamp_str) if event_timestamp_str else None
+    else:
+        event = cls.from_details(details)
+        if blob_store is not None and isinstance(event, AttackSimulated) and isinstance(event.output, BlobRef):
+            event.output.store = blob_store
+    event.ts = ts # As recorded; a line without a timestamp does not get one invented here
+    return event
+
+
+def event_from_json(line: str, blob_store=None) -> Event:
+    return event_from_dict(json.loads(line), blob_store)
+
+
+if __name__ == "__main__":
+    print("--- Typed Event Model ---")
+    event = AttackSimulated(attack_type="sql injection", target="scenario_db_server", success=True, output="Dumped 'users' table.")
+    line = event.to_json()
+    print(f"Serialised: {line}")
+    parsed = event_from_json(line)
+    print(f"Parsed back: {parsed!r}")
+    print(f"Round-trip equal: {parsed.to_dict() == event.to_dict()}")
@@ -0,0 +1,116 @@
+# src/llm_session.py
+import json
+import os
+import threading
+import time
+import requests
+
+# --- Ollama LLM Session Layer ---
+# Talks to the Ollama HTTP API directly so that we can:
+#   * warm the model up in the background (overlapped with Phase 1 provisioning),
+#   * keep it resident between calls with `keep_alive`,
+#   * always send the same static prompt prefix first, so the server can reuse the already
+#     evaluated prefix from its prompt cache and only evaluate the small dynamic suffix,
+#   * measure time-to-first-token (TTFT) for every call.
+DEFAULT_OLLAMA_BASE_URL = "http://localhost:11434" # Overridable via OLLAMA_BASE_URL in .env
+DEFAULT_KEEP_ALIVE = "30m" # How long Ollama keeps the model loaded after the last request
+
+
+class LLMSession:
+    def __init__(self, model: str = "mistral", static_prefix: str = "", base_url: str = None,
+                 keep_alive: str = DEFAULT_KEEP_ALIVE, request_timeout: float = 300):
+        self.model = model
+        self.static_prefix = static_prefix
+        self.base_url = (base_url or os.getenv("OLLAMA_BASE_URL", DEFAULT_OLLAMA_BASE_URL)).rstrip("/")
+        self.keep_alive = keep_alive
+        self.request_timeout = request_timeout
+        self.http = requests.Session()
+        self.warm = threading.Event() # Set once warm-up has finished (successfully or not)
+        self.warmed_up = False
+        self._warm_thread = None
+        self.last_call_stats = {}
+
+    def warm_up(self) -> bool:
+        """Loads the model and evaluates the static prefix once, so the first real call skips both."""
+        start = time.perf_counter()
+        try:
+            response = self.http.post(f"{self.base_url}/api/generate", json={
+                "model": self.model,
+                "prompt": self.static_prefix,
+                "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": {"num_predict": 1}
+            }, timeout=self.request_timeout)
+            response.raise_for_status()
+            self.warmed_up = True
+        except requests.exceptions.RequestException as e:
+            print(f"Warning: LLM warm-up for '{self.model}' failed: {e}")
+            return False
+        finally:
+            self.warm.set() # Never leave callers waiting on a failed warm-up
+        print(f"LLM '{self.model}' warmed up in {time.perf_counter() - start:.2f}s (keep_alive={self.keep_alive}).")
+        return True
+
+    def warm_up_async(self) -> threading.Thread:
+        """Starts warm_up() on a background thread (idempotent)."""
+        if self._warm_thread is None:
+            self._warm_thread = threading.Thread(target=self.warm_up, name="llm-warm-up", daemon=True)
+            self._warm_thread.start()
+        return self._warm_thread
+
+    def invoke(self, dynamic_suffix: str) -> str:
+        """Sends static_prefix + dynamic_suffix and returns the generated text.
+
+        Per-call timing is stored in `last_call_stats`, including time-to-first-token and the
+        number of prompt tokens the server actually had to evaluate (lower when the prefix was reused).
+        """
+        start = time.perf_counter()
+        first_token_at = None
+        chunks = []
+        final = {}
+        with self.http.post(f"{self.base_url}/api/generate", json={
+            "model": self.model,
+            "prompt": self.static_prefix + dynamic_suffix,
+            "stream": True,
+            "keep_alive": self.keep_alive
+        }, stream=True, timeout=self.request_timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("response"):
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    chunks.append(chunk["response"])
+                if chunk.get("done"):
+                    final = chunk
+                    break
+        end = time.perf_counter()
+
+        self.last_call_stats = {
+            "model": self.model,
+            "ttft_seconds": round((first_token_at or end) - start, 4),
+            "total_seconds": round(end - start, 4),
+            "prompt_eval_count": final.get("prompt_eval_count"),
+            "eval_count": final.get("eval_count"),
+            "load_seconds": round(final.get("load_duration", 0) / 1e9, 4), # Ollama reports durations in ns
+            "warmed_up": self.warmed_up
+        }
+        print(f"LLM call: time-to-first-token {self.last_call_stats['ttft_seconds']:.3f}s, "
+              f"total {self.last_call_stats['total_seconds']:.3f}s, prompt tokens evaluated: {final.get('prompt_eval_count')}")
+        return "".join(chunks)
+
+    def close(self):
+        self.http.close()
+
+
+if __name__ == "__main__":
+    print("--- Ollama LLM Session ---")
+    session = LLMSession(model="mistral", static_prefix="You are a concise assistant. Answer in one word.\n")
+    session.warm_up_async()
+    session.warm.wait()
+    for question in ["What color is the sky?", "What color is grass?"]:
+        print(f"Q: {question} -> A: {session.invoke(question).strip()}")
+        print(f"Call stats: {session.last_call_stats}")
+    session.close()
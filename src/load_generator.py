@@ -0,0 +1,173 @@
+# src/load_generator.py
+import argparse
+import contextlib
+import json
+import math
+import os
+import queue
+import threading
+import time
+from src.defense_agent import analyze_log_entry, select_response, execute_automated_response
+from src.evaluation_agent import log_event
+from src.events import AnomalyDetected, DefenseExecuted
+from src.scenario_content_gen import SyntheticLogGenerator
+
+# --- Synthetic Log-Storm Load Generator ---
+# Emits the INFO/ALERT/CRITICAL/WARNING/ERROR log templates used in run_cyber_range_exercise at a
+# controlled rate (with optional bursts) into a bounded queue, and drives the defense path
+# (analyze_log_entry -> execute_automated_response -> log_event) from worker threads, measuring
+# sustained throughput, queue depth, drops and detection latency.
+LOAD_TEST_LOG_PATH = "logs/load_test_events.log" # Kept apart from the exercise log
+
+
+def _dry_run_response(response_details: dict) -> dict:
+    """Stand-in for execute_automated_response that does not touch Docker."""
+    action = {"block_ip": "IP_BLOCKED", "isolate_host": "HOST_ISOLATED"}.get(response_details["response_type"], "UNSUPPORTED_RESPONSE")
+    return {"success": action != "UNSUPPORTED_RESPONSE", "action": action, "target": response_details["target"]}
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1) # Nearest-rank
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class LogStormGenerator(SyntheticLogGenerator):
+    """Produces synthetic log lines: `rate` lines/s, switching to `burst_rate` for
+    `burst_duration` seconds every `burst_every` seconds, with `ip_cardinality` distinct source IPs."""
+
+    def __init__(self, rate: float = 100, burst_rate: float = None, burst_every: float = 10, burst_duration: float = 2,
+                 ip_cardinality: int = 256, mix: list = None, seed: int = None):
+        super().__init__(ip_cardinality=ip_cardinality, mix=mix, seed=seed)
+        self.rate = rate
+        self.burst_rate = burst_rate
+        self.burst_every = burst_every
+        self.burst_duration = burst_duration
+
+    def rate_at(self, elapsed: float) -> float:
+        if self.burst_rate and self.burst_every > 0 and (elapsed % self.burst_every) < self.burst_duration:
+            return self.burst_rate
+        return self.rate
+
+
+def run_load_test(generator: LogStormGenerator, duration_seconds: float = 10, queue_size: int = 1000,
+                  workers: int = 1, dry_run: bool = True, log_path: str = LOAD_TEST_LOG_PATH,
+                  quiet: bool = True) -> dict:
+    """Drives the defense path with `generator` for `duration_seconds` and returns load metrics."""
+    line_queue = queue.Queue(maxsize=queue_size)
+    respond = _dry_run_response if dry_run else execute_automated_response
+    stats_lock = threading.Lock()
+    detection_latencies, end_to_end_latencies, completion_times = [], [], []
+    counters = {"generated": 0, "enqueued": 0, "dropped": 0, "processed": 0, "anomalies": 0, "errors": 0}
+    depth_samples = []
+
+    def worker():
+        while True:
+            item = line_queue.get()
+            if item is None:
+                return
+            line, enqueued_at = item
+            try:
+                is_anomaly = analyze_log_entry(line)
+                detected_at = time.perf_counter()
+                if is_anomaly:
+                    log_event(AnomalyDetected(log_entry=line), log_path=log_path)
+                    defense_result = respond(select_response(line))
+                    log_event(DefenseExecuted(action_details=defense_result), log_path=log_path)
+                done_at = time.perf_counter()
+                with stats_lock:
+                    counters["processed"] += 1
+                    counters["anomalies"] += 1 if is_anomaly else 0
+                    detection_latencies.append(detected_at - enqueued_at)
+                    end_to_end_latencies.append(done_at - enqueued_at)
+                    completion_times.append(done_at)
+            except Exception as e:
+                with stats_lock:
+                    counters["errors"] += 1
+                print(f"Warning: defense path failed for load-test line: {e}")
+
+    with contextlib.ExitStack() as stack:
+        if quiet: # The defense path prints per line; keep the terminal (not the cost) out of the measurement
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        threads = [threading.Thread(target=worker, name=f"load-worker-{i}", daemon=True) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+
+        start = time.perf_counter()
+        due = 0.0 # Fractional number of lines owed at the current rate
+        last = start
+        while True:
+            now = time.perf_counter()
+            elapsed = now - start
+            if elapsed >= duration_seconds:
+                break
+            due += generator.rate_at(elapsed) * (now - last)
+            last = now
+            while due >= 1:
+                due -= 1
+                counters["generated"] += 1
+                try:
+                    line_queue.put_nowait((generator.make_line(), time.perf_counter()))
+                    counters["enqueued"] += 1
+                except queue.Full:
+                    counters["dropped"] += 1 # Backpressure: the defense path is falling behind
+            depth_samples.append(line_queue.qsize())
+            time.sleep(0.001)
+        produced_until = time.perf_counter()
+
+        for _ in threads:
+            line_queue.put(None) # Drain what is queued, then stop
+        for thread in threads:
+            thread.join()
+        finished = time.perf_counter()
+
+    # Sustained throughput: median of per-second completion counts while the producer was running
+    per_second = {}
+    for done_at in completion_times:
+        if done_at < produced_until:
+            second = int(done_at - start)
+            per_second[second] = per_second.get(second, 0) + 1
+    full_seconds = sorted(count for second, count in per_second.items() if second < int(produced_until - start))
+    detection_latencies.sort()
+    end_to_end_latencies.sort()
+    depth_samples.sort()
+
+    return {
+        "config": {"rate": generator.rate, "burst_rate": generator.burst_rate, "burst_every": generator.burst_every,
+                   "burst_duration": generator.burst_duration, "ip_cardinality": len(generator.ips),
+                   "duration_seconds": duration_seconds, "queue_size": queue_size, "workers": workers, "dry_run": dry_run},
+        **counters,
+        "offered_lines_per_second": round(counters["generated"] / (produced_until - start), 1),
+        "sustained_lines_per_second": _percentile(full_seconds, 50) if full_seconds else round(counters["processed"] / (finished - start), 1),
+        "drain_seconds": round(finished - produced_until, 3),
+        "queue_depth": {"max": depth_samples[-1] if depth_samples else 0,
+                        "mean": round(sum(depth_samples) / len(depth_samples), 1) if depth_samples else 0,
+                        "p95": _percentile(depth_samples, 95)},
+        "detection_latency_ms": {f"p{p}": round(_percentile(detection_latencies, p) * 1000, 3) for p in (50, 90, 99)},
+        "end_to_end_latency_ms": {f"p{p}": round(_percentile(end_to_end_latencies, p) * 1000, 3) for p in (50, 90, 99, 100)},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log-storm load test for the defense path.")
+    parser.add_argument("--rate", type=float, default=200, help="Base log lines per second")
+    parser.add_argument("--burst-rate", type=float, default=None, help="Lines per second during bursts")
+    parser.add_argument("--burst-every", type=float, default=10, help="Seconds between burst starts")
+    parser.add_argument("--burst-duration", type=float, default=2, help="Length of each burst in seconds")
+    parser.add_argument("--ip-cardinality", type=int, default=256, help="Number of distinct source IPs")
+    parser.add_argument("--duration", type=float, default=10, help="Test duration in seconds")
+    parser.add_argument("--queue-size", type=int, default=1000, help="Bounded queue capacity (lines)")
+    parser.add_argument("--workers", type=int, default=1, help="Defense worker threads")
+    parser.add_argument("--live-response", action="store_true", help="Execute real Docker responses instead of a dry run")
+    parser.add_argument("--log-path", default=LOAD_TEST_LOG_PATH, help="Where the load test's events are logged")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.log_path) or ".", exist_ok=True)
+    storm = LogStormGenerator(rate=args.rate, burst_rate=args.burst_rate, burst_every=args.burst_every,
+                              burst_duration=args.burst_duration, ip_cardinality=args.ip_cardinality, seed=args.seed)
+    print(f"--- Log-Storm Load Test: {args.rate} lines/s for {args.duration}s ---")
+    results = run_load_test(storm, duration_seconds=args.duration, queue_size=args.queue_size, workers=args.workers,
+                            dry_run=not args.live_response, log_path=args.log_path)
+    print(json.dumps(results, indent=4))
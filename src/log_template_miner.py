@@ -0,0 +1,114 @@
+# src/log_template_miner.py
+import re
+
+# --- Online Log Template Mining (Drain-style) ---
+# Log lines are grouped into templates: constant tokens stay as-is, tokens that vary
+# between lines of the same template (IPs, users, PIDs, ...) become "<*>" slots.
+WILDCARD = "<*>"
+_HAS_DIGIT = re.compile(r"\d")
+
+
+class LogCluster:
+    """A single mined template and how many lines have been assigned to it."""
+    __slots__ = ("cluster_id", "template_tokens", "size")
+
+    def __init__(self, cluster_id: int, template_tokens: list):
+        self.cluster_id = cluster_id
+        self.template_tokens = template_tokens
+        self.size = 1
+
+    def get_template(self) -> str:
+        return " ".join(self.template_tokens)
+
+
+class TemplateMiner:
+    """Fixed-depth prefix tree that assigns each log line to a template in near-constant time.
+
+    Level 1 of the tree is the token count, the next `depth - 2` levels are the leading
+    tokens of the line (tokens containing digits are routed to the wildcard branch),
+    and the leaves hold a short list of candidate clusters.
+    """
+
+    def __init__(self, depth: int = 4, sim_threshold: float = 0.5, max_children: int = 100):
+        self.depth = max(depth, 3)
+        self.sim_threshold = sim_threshold
+        self.max_children = max_children
+        self.root = {}
+        self.clusters = {}  # {cluster_id: LogCluster}
+
+    @staticmethod
+    def tokenize(log_line: str) -> list:
+        # Tokens carrying digits (IPs, PIDs, ports, counters) are variables from the start
+        return [WILDCARD if _HAS_DIGIT.search(token) else token for token in log_line.strip().split()]
+
+    def add_log_message(self, log_line: str, count: int = 1):
+        """Assigns a log line (seen `count` times) to a template.
+
+        Returns (cluster, changed) where `changed` is True when a new template was created
+        or an existing template gained a new wildcard slot.
+        """
+        tokens = self.tokenize(log_line)
+        leaf = self._get_leaf(tokens)
+        cluster = self._fast_match(leaf, tokens)
+        if cluster is None:
+            cluster = LogCluster(len(self.clusters) + 1, tokens)
+            cluster.size = count
+            self.clusters[cluster.cluster_id] = cluster
+            leaf.append(cluster)
+            return cluster, True
+
+        cluster.size += count
+        changed = False
+        for i, (template_token, token) in enumerate(zip(cluster.template_tokens, tokens)):
+            if template_token != token and template_token != WILDCARD:
+                cluster.template_tokens[i] = WILDCARD
+                changed = True
+        return cluster, changed
+
+    def extract_parameters(self, cluster: LogCluster, log_line: str) -> list:
+        """Returns the raw tokens of `log_line` that fall into the template's wildcard slots."""
+        raw_tokens = log_line.strip().split()
+        return [raw for raw, template_token in zip(raw_tokens, cluster.template_tokens) if template_token == WILDCARD]
+
+    def _get_leaf(self, tokens: list) -> list:
+        node = self.root.setdefault(len(tokens), {})
+        for token in tokens[:self.depth - 2]:
+            if token not in node:
+                # Keep the tree bounded: once a node is full, new branches share the wildcard child
+                token = token if len(node) < self.max_children else WILDCARD
+            node = node.setdefault(token, {})
+        return node.setdefault(None, [])  # Leaf cluster list lives under the None key
+
+    def _fast_match(self, leaf: list, tokens: list):
+        best_cluster, best_sim = None, -1.0
+        for cluster in leaf:
+            same = sum(1 for a, b in zip(cluster.template_tokens, tokens) if a == b and a != WILDCARD)
+            wildcards = cluster.template_tokens.count(WILDCARD)
+            constant = len(tokens) - wildcards
+            sim = same / constant if constant else 1.0
+            if sim > best_sim:
+                best_cluster, best_sim = cluster, sim
+        return best_cluster if best_sim >= self.sim_threshold else None
+
+    def get_template_counts(self) -> list:
+        """Returns [{"template_id", "template", "count"}] ordered by how often each template was seen."""
+        clusters = sorted(self.clusters.values(), key=lambda c: c.size, reverse=True)
+        return [{"template_id": c.cluster_id, "template": c.get_template(), "count": c.size} for c in clusters]
+
+
+if __name__ == "__main__":
+    print("--- Online Log Template Miner ---")
+    miner = TemplateMiner()
+    sample_logs = [
+        "[INFO] User bob logged in successfully from 192.168.1.100.",
+        "[INFO] User alice logged in successfully from 192.168.1.10.",
+        "[ALERT] Multiple failed login attempts from 10.0.0.5 for user 'root'!",
+        "[ALERT] Multiple failed login attempts from 10.0.0.77 for user 'root'!",
+        "[WARNING] Unusual process 'nc -lvp 4444' started on scenario_app_server.",
+    ]
+    for line in sample_logs:
+        cluster, changed = miner.add_log_message(line)
+        print(f"Template #{cluster.cluster_id} ({'updated' if changed else 'unchanged'}): {cluster.get_template()}")
+    print("\nTemplate counts:")
+    for entry in miner.get_template_counts():
+        print(f"  #{entry['template_id']} x{entry['count']}: {entry['template']}")
@@ -0,0 +1,228 @@
+# src/replay_engine.py
+import argparse
+import contextlib
+import json
+import os
+import time
+from src.defense_agent import analyze_log_entry, select_response, TemplateVerdictCache
+from src.evaluation_agent import ReportAccumulator, iter_log_events
+from src.events import AnomalyDetected, DefenseExecuted
+
+# --- Accelerated Replay of Recorded Exercises ---
+# Streams a recorded event log (or a session from the event repository) back through the
+# defense analyzer and the evaluator, entirely offline (no Docker, no Ollama):
+#   * every RAW_LOG_ENTRY is re-analysed with the current rules,
+#   * the recorded ANOMALY_DETECTED / DEFENSE_EXECUTED events are replaced by the replayed ones,
+#   * everything else (attacks, scenario events, ...) is passed through unchanged.
+# Automated responses are not executed: a replayed defense reuses the recorded result for the
+# same log line, or is marked NOT_EXECUTED_IN_REPLAY when the original run did not respond.
+
+_ATTACK_EVENT_TYPES = ("ATTACK_DECISION", "ATTACK_SIMULATED")
+MAX_IDLE_GAP_SECONDS = 5.0 # Paced replays wait at most this long (wall time) for any one gap between events
+
+
+class _DetectionRecord:
+    """One recorded RAW_LOG_ENTRY with what happened to it originally and in the replay."""
+    __slots__ = ("index", "raw", "original_anomaly", "original_defense", "replay_detected")
+
+    def __init__(self, index: int, raw):
+        self.index = index
+        self.raw = raw
+        self.original_anomaly = None
+        self.original_defense = None
+        self.replay_detected = False
+
+
+def _replayed_events(record: _DetectionRecord) -> list:
+    """Builds the replayed ANOMALY_DETECTED / DEFENSE_EXECUTED events for one log line."""
+    if not record.replay_detected:
+        return []
+    log_entry = record.raw.log
+    # Keep the original timing where there is one, so time-to-detect/remediate stay comparable
+    anomaly = record.original_anomaly
+    anomaly_ts, anomaly_event_ts = (anomaly.ts, anomaly.event_ts) if anomaly is not None else (record.raw.ts, record.raw.ts)
+    events = [AnomalyDetected(ts=anomaly_ts, event_ts=anomaly_event_ts, log_entry=log_entry)]
+    if record.original_defense is not None:
+        action_details = record.original_defense.get("action_details")
+        defense_ts, defense_event_ts = record.original_defense.ts, record.original_defense.event_ts
+    else:
+        response = select_response(log_entry)
+        action_details = {"success": False, "action": "NOT_EXECUTED_IN_REPLAY", "target": response["target"],
+                          "response_type": response["response_type"]}
+        defense_ts, defense_event_ts = anomaly_ts, anomaly_event_ts
+    events.append(DefenseExecuted(ts=defense_ts, event_ts=defense_event_ts, action_details=action_details))
+    return events
+
+
+class _Pacer:
+    """Sleeps until each event is due at `speed`x real time (no-op when speed is None/<= 0).
+
+    Each gap between consecutive events is waited for at most `max_gap_seconds` of wall time
+    (None = uncapped), so idle stretches between sessions do not stall the replay for hours.
+    """
+    __slots__ = ("speed", "max_gap_seconds", "wall_start", "due", "last_ts")
+
+    def __init__(self, speed: float, max_gap_seconds: float = MAX_IDLE_GAP_SECONDS):
+        self.speed = speed if speed and speed > 0 else None
+        self.max_gap_seconds = max_gap_seconds
+        self.wall_start = time.perf_counter()
+        self.due = 0 # Wall seconds after wall_start at which the last paced event was due
+        self.last_ts = None
+
+    def wait(self, event_ts: float):
+        if self.speed is None or event_ts is None:
+            return
+        if self.last_ts is not None:
+            gap = max(0, event_ts - self.last_ts) / self.speed
+            self.due += gap if self.max_gap_seconds is None else min(gap, self.max_gap_seconds)
+        self.last_ts = event_ts
+        delay = self.wall_start + self.due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def replay_events(events, speed: float = None, verbose: bool = False, output_path: str = None,
+                  max_gap_seconds: float = MAX_IDLE_GAP_SECONDS) -> dict:
+    """Replays an iterable of recorded events and returns detection and report diffs against the original.
+
+    `speed` is a multiple of real time (1.0 = as recorded); None or <= 0 replays as fast as possible.
+    Events are streamed: the original and replayed reports are accumulated as they arrive, and
+    `output_path` (if given) receives the replayed events as they are produced.
+    """
+    original_accumulator, replayed_accumulator = ReportAccumulator(), ReportAccumulator()
+    events_replayed = 0
+    log_lines = 0
+    original_detections = replayed_detections = 0
+    changed = []
+    current = None
+    first_ts = last_ts = None
+    pacer = _Pacer(speed, max_gap_seconds)
+    # A fresh template cache per replay: results must not depend on what this process analysed
+    # before, and the live cache and its stats must not be touched
+    verdict_cache = TemplateVerdictCache()
+    null_out = open(os.devnull, "w") if not verbose else None
+    output = open(output_path, "w") if output_path else None
+
+    def emit(event):
+        replayed_accumulator.add(event)
+        if output is not None:
+            output.write(event.to_json() + "\n")
+
+    def finish_current():
+        nonlocal original_detections, replayed_detections
+        if current is None:
+            return
+        original_detected = current.original_anomaly is not None
+        original_detections += original_detected
+        replayed_detections += current.replay_detected
+        if original_detected != current.replay_detected:
+            changed.append({"index": current.index, "log": current.raw.log,
+                            "original": original_detected, "replayed": current.replay_detected})
+        for event in _replayed_events(current):
+            emit(event)
+
+    try:
+        with contextlib.redirect_stdout(null_out) if null_out else contextlib.nullcontext():
+            for event in events:
+                events_replayed += 1
+                original_accumulator.add(event)
+                if event.ts is not None:
+                    first_ts = event.ts if first_ts is None else first_ts
+                    last_ts = event.ts
+                pacer.wait(event.ts)
+                event_type = event.event_type
+
+                if event_type == "RAW_LOG_ENTRY" and event.get("log") is not None:
+                    finish_current()
+                    current = _DetectionRecord(log_lines, event)
+                    log_lines += 1
+                    current.replay_detected = analyze_log_entry(event.log, verdict_cache=verdict_cache)
+                    emit(event)
+                elif event_type == "ANOMALY_DETECTED" and current is not None:
+                    current.original_anomaly = event
+                elif event_type == "DEFENSE_EXECUTED" and current is not None and current.original_defense is None:
+                    current.original_defense = event
+                else:
+                    if event_type in _ATTACK_EVENT_TYPES:
+                        # A new cycle: the previous log line's detection/defense belongs before it
+                        finish_current()
+                        current = None
+                    emit(event)
+            finish_current()
+            wall_seconds = time.perf_counter() - pacer.wall_start
+            original_report = original_accumulator.report()
+            replayed_report = replayed_accumulator.report()
+    finally:
+        if null_out is not None:
+            null_out.close()
+        if output is not None:
+            output.close()
+
+    recorded_span = (last_ts - first_ts) if first_ts is not None else 0
+    summary_diff = {}
+    for metric, original_value in original_report.get("summary", {}).items():
+        a, b = _to_number(original_value), _to_number(replayed_report["summary"].get(metric))
+        summary_diff[metric] = {"original": a, "replayed": b, "delta": (b - a) if a is not None and b is not None else None}
+
+    return {
+        "events_replayed": events_replayed,
+        "log_lines_reanalysed": log_lines,
+        "recorded_span_seconds": round(recorded_span, 3),
+        "wall_seconds": round(wall_seconds, 3),
+        "speedup": round(recorded_span / wall_seconds, 1) if wall_seconds > 0 else None,
+        "detections": {
+            "original": original_detections,
+            "replayed": replayed_detections,
+            "newly_detected": [c for c in changed if c["replayed"]],
+            "no_longer_detected": [c for c in changed if not c["replayed"]],
+        },
+        "summary_diff": summary_diff,
+        "template_cache": {k: v for k, v in verdict_cache.get_stats().items() if k != "template_counts"},
+        "original_report": original_report,
+        "replayed_report": replayed_report,
+    }
+
+
+def replay_log(log_path: str, speed: float = None, verbose: bool = False, output_path: str = None,
+               max_gap_seconds: float = MAX_IDLE_GAP_SECONDS) -> dict:
+    """Replays a recorded JSON-lines event log (e.g. logs/cyber_range_events.log)."""
+    print(f"\n--- Replaying {log_path} at {'max' if not speed or speed <= 0 else f'{speed}x'} speed ---")
+    return replay_events(iter_log_events(log_path), speed=speed, verbose=verbose, output_path=output_path,
+                         max_gap_seconds=max_gap_seconds)
+
+
+def replay_session(repository, session_id: str, speed: float = None, verbose: bool = False, output_path: str = None,
+                   max_gap_seconds: float = MAX_IDLE_GAP_SECONDS) -> dict:
+    """Replays one session stored in the event repository."""
+    print(f"\n--- Replaying session {session_id} from event repository ---")
+    repository.flush()
+    return replay_events(repository.iter_events(session_id=session_id), speed=speed, verbose=verbose, output_path=output_path,
+                         max_gap_seconds=max_gap_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded cyber range exercise offline.")
+    parser.add_argument("log_path", nargs="?", default="logs/cyber_range_events.log")
+    parser.add_argument("--speed", type=float, default=0, help="Multiple of real time (1 = as recorded, 0 = as fast as possible)")
+    parser.add_argument("--max-gap", type=float, default=MAX_IDLE_GAP_SECONDS,
+                        help="Longest wall-clock wait for one gap between events when pacing (seconds)")
+    parser.add_argument("--output", help="Write the replayed event stream to this JSON-lines file")
+    parser.add_argument("--verbose", action="store_true", help="Show the defense agent's per-line analysis output")
+    args = parser.parse_args()
+
+    result = replay_log(args.log_path, speed=args.speed, verbose=args.verbose, output_path=args.output,
+                         max_gap_seconds=args.max_gap)
+    print(f"Replayed {result['events_replayed']} events ({result['log_lines_reanalysed']} log lines) in "
+          f"{result['wall_seconds']}s, {result['speedup']}x the recorded {result['recorded_span_seconds']}s.")
+    print(f"Detections: original {result['detections']['original']}, replayed {result['detections']['replayed']}")
+    for change in result["detections"]["newly_detected"] + result["detections"]["no_longer_detected"]:
+        print(f"  #{change['index']}: {'now detected' if change['replayed'] else 'no longer detected'}: {change['log']}")
+    print("\n--- Report Metrics Diff ---")
+    print(json.dumps(result["summary_diff"], indent=4))
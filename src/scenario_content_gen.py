@@ -52,6 +52,36 @@ def generate_deepfake_scenario_text(person_name: str, context: str):
     )
     return scenario_text
 
+# --- Synthetic Log Lines ---
+# (weight, template) - same shapes as the mock entries in main_orchestrator.py
+LOG_TEMPLATE_MIX = [
+    (0.35, "[INFO] User {user} logged in successfully from {ip}."),
+    (0.25, "[ALERT] Multiple failed login attempts from {ip} for user 'root'!"),
+    (0.15, "[CRITICAL] Unauthorized file access detected on scenario_web_server for sensitive.conf!"),
+    (0.15, "[WARNING] Unusual process 'nc -lvp {port}' started on scenario_app_server."),
+    (0.10, "[ERROR] Service 'web_db_api' crashed due to segmentation fault."),
+]
+_LOG_USERS = ["bob", "alice", "admin", "carol", "dave"]
+
+class SyntheticLogGenerator:
+    """Produces log lines from a weighted template `mix`, with `ip_cardinality` distinct source IPs."""
+
+    def __init__(self, ip_cardinality: int = 256, mix: list = None, seed: int = None):
+        self.random = random.Random(seed)
+        self.ips = [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(1, ip_cardinality + 1)]
+        mix = mix or LOG_TEMPLATE_MIX
+        self.templates = [template for _, template in mix]
+        self.weights = [weight for weight, _ in mix]
+
+    def make_line(self) -> str:
+        template = self.random.choices(self.templates, weights=self.weights)[0]
+        return template.format(ip=self.random.choice(self.ips), user=self.random.choice(_LOG_USERS),
+                               port=self.random.randint(1024, 65535))
+
+def generate_log_set(count: int, mix: list = None, ip_cardinality: int = 256, seed: int = None) -> list:
+    generator = SyntheticLogGenerator(ip_cardinality=ip_cardinality, mix=mix, seed=seed)
+    return [generator.make_line() for _ in range(count)]
+
 if __name__ == "__main__":
     random.seed(42) # For reproducible examples
 
@@ -74,4 +104,9 @@ if __name__ == "__main__":
     print("\n3. Generated Deepfake Scenario Text:")
     print(deepfake_text)
 
+    # Example 4: Synthetic Log Lines
+    print("\n4. Generated Log Set:")
+    for log_line in generate_log_set(3, seed=42):
+        print(log_line)
+
     print("\nContent generation capabilities expanded.")
\ No newline at end of file
@@ -0,0 +1,107 @@
+# src/verdict_cache_benchmark.py
+import argparse
+import json
+import random
+import re
+import time
+from src.defense_agent import TemplateVerdictCache, _evaluate_rules, _match_anomaly_rules, NORMAL_LOG_PATTERNS
+from src.scenario_content_gen import generate_log_set
+from src.adaptation_precompute import HARD_LOG_MIX
+
+# --- Verdict Cache Benchmark ---
+# Classifies the same log stream three ways and checks they agree:
+#   * reference: the original rule path (one re.search per normal pattern),
+#   * rules:     the current rule path on every line (use_template_cache=False),
+#   * cached:    TemplateVerdictCache (exact-line verdicts, template mining deferred).
+# Workloads: the mock entries run_cyber_range_exercise draws from, and a log storm of the
+# exercise template mix plus the harder weakness-drill mix (random ports, 4096 IPs).
+
+
+def _reference_rules(log_entry: str) -> tuple:
+    """The rule path as it was before the verdict cache (kept here as the baseline)."""
+    rule_message = _match_anomaly_rules(log_entry)
+    if rule_message is not None:
+        return True, rule_message
+    for pattern in NORMAL_LOG_PATTERNS:
+        if re.search(pattern, log_entry):
+            return False, "Log matches a normal pattern. No anomaly."
+    return True, "No specific rule triggered, and no normal pattern matched. POTENTIAL ANOMALY DETECTED for human review."
+
+
+def exercise_lines(count: int, seed: int = 1) -> list:
+    """Log lines as drawn in run_cyber_range_exercise's defense cycle."""
+    rng = random.Random(seed)
+    return [rng.choice([
+        "[INFO] User bob logged in successfully from 192.168.1.100.",
+        f"[ALERT] Multiple failed login attempts from 10.0.0.{rng.randint(1, 255)} for user 'root'!",
+        "[CRITICAL] Unauthorized file access detected on scenario_web_server for sensitive.conf!",
+        "[WARNING] Unusual process 'nc -lvp 4444' started on scenario_app_server.",
+        "[ERROR] Service 'web_db_api' crashed due to segmentation fault.",
+    ]) for _ in range(count)]
+
+
+def log_storm_lines(count: int, seed: int = 1) -> list:
+    return (generate_log_set(count // 2, seed=seed) +
+            generate_log_set(count - count // 2, mix=HARD_LOG_MIX, ip_cardinality=4096, seed=seed + 1))
+
+
+def _best_of(repeats: int, fn) -> float:
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None or elapsed < best else best
+    return best
+
+
+def benchmark_lines(lines: list, repeats: int = 5) -> dict:
+    reference_seconds = _best_of(repeats, lambda: [_reference_rules(line) for line in lines])
+    rules_seconds = _best_of(repeats, lambda: [_evaluate_rules(line) for line in lines])
+    caches = []
+    def cached_pass():
+        verdict_cache = TemplateVerdictCache()
+        caches.append(verdict_cache)
+        evaluate = verdict_cache.evaluate
+        for line in lines:
+            evaluate(line)
+    cached_seconds = _best_of(repeats, cached_pass)
+
+    # Template mining happens when the statistics are read, off the per-line path
+    start = time.perf_counter()
+    stats = caches[-1].get_stats()
+    mining_seconds = time.perf_counter() - start
+
+    check_cache = TemplateVerdictCache()
+    mismatches = sum(1 for line in lines
+                     if not (check_cache.evaluate(line)[0] == _evaluate_rules(line)[0] == _reference_rules(line)[0]))
+    return {
+        "lines": len(lines),
+        "distinct_lines": len(set(lines)),
+        "reference_rules_seconds": round(reference_seconds, 4),
+        "rules_seconds": round(rules_seconds, 4),
+        "cached_seconds": round(cached_seconds, 4),
+        "speedup_vs_reference": round(reference_seconds / cached_seconds, 2),
+        "speedup_vs_rules": round(rules_seconds / cached_seconds, 2),
+        "cache_hit_rate": round(stats["cache_hit_rate"], 3),
+        "template_mining_seconds": round(mining_seconds, 4),
+        "templates_mined": stats["templates_mined"],
+        "verdict_mismatches": mismatches,
+    }
+
+
+def run_benchmark(line_count: int = 42000, repeats: int = 5, seed: int = 1) -> dict:
+    return {
+        "exercise": benchmark_lines(exercise_lines(line_count, seed), repeats),
+        "log_storm": benchmark_lines(log_storm_lines(line_count, seed), repeats),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the defense verdict cache against the rule path.")
+    parser.add_argument("--lines", type=int, default=42000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    print(f"--- Verdict Cache Benchmark: {args.lines} lines per workload ---")
+    print(json.dumps(run_benchmark(args.lines, args.repeats, args.seed), indent=4))